@@ -0,0 +1,126 @@
+import os
+import time
+import random
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import Json
+
+from app.db import get_shared_state_cursor
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory")  # memory | postgres
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry and LRU eviction."""
+
+    def __init__(self, ttl_seconds, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    del self.data[key]
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl_seconds=None):
+        expires = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self.lock:
+            self.data[key] = (expires, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def invalidate_prefixes(self, prefixes):
+        prefixes = tuple(prefixes)
+        with self.lock:
+            for key in [k for k in self.data if k.startswith(prefixes)]:
+                del self.data[key]
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.data), "hits": self.hits, "misses": self.misses}
+
+class PostgresCache:
+    """
+    Same interface as TTLCache, backed by an UNLOGGED Postgres table so every worker
+    process shares one cache. Values must be JSON-serializable.
+
+    Best-effort: a DB error (or no free shared-state connection) reads as a miss and
+    skips the write, so the cache can slow a request down but never fail it.
+    """
+
+    def __init__(self, namespace, ttl_seconds):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        try:
+            with get_shared_state_cursor() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT value FROM shared_cache WHERE key = %s AND expires_at > NOW();",
+                        (self._key(key),)
+                    )
+                    row = cursor.fetchone()
+        except Exception as e:
+            print(f"Shared Cache Error: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value, ttl_seconds=None):
+        try:
+            with get_shared_state_cursor() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO shared_cache (key, value, expires_at)
+                        VALUES (%s, %s, NOW() + make_interval(secs => %s))
+                        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at;
+                    """, (self._key(key), Json(value), ttl_seconds or self.ttl_seconds))
+                    # Cheap amortized cleanup instead of a separate janitor process
+                    if random.random() < 0.01:
+                        cursor.execute("DELETE FROM shared_cache WHERE expires_at < NOW();")
+                conn.commit()
+        except Exception as e:
+            print(f"Shared Cache Error: {e}")
+
+    def invalidate_prefixes(self, prefixes):
+        patterns = [self._key(p) + "%" for p in prefixes]
+        try:
+            with get_shared_state_cursor() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM shared_cache WHERE key LIKE ANY(%s);", (patterns,))
+                conn.commit()
+        except Exception as e:
+            print(f"Shared Cache Error: {e}")
+
+    def stats(self):
+        return {"backend": "postgres", "hits": self.hits, "misses": self.misses}
+
+def make_cache(namespace, ttl_seconds, shared=True):
+    """
+    Per-process cache by default; SHARED_STATE_BACKEND=postgres shares it across workers.
+    shared=False keeps it per-process regardless.
+    """
+    if shared and SHARED_STATE_BACKEND == "postgres":
+        return PostgresCache(namespace, ttl_seconds)
+    return TTLCache(ttl_seconds)
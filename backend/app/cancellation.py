@@ -0,0 +1,88 @@
+"""
+Cooperative cancellation for the /cafes stream.
+
+Every slow step (DB query, Places call, Gemini call) is raced against the client
+disconnecting. On disconnect the step is cancelled for real: httpx requests are
+aborted by task cancellation, and DB statements are cancelled server-side through
+`on_cancel` (psycopg2's connection.cancel()), so no worker or quota keeps burning on
+a stream nobody is reading. connection.cancel() is a blocking round trip to the server,
+so hooks run on their own small thread pool, never on the event loop (and never queued
+behind the DB calls they are cancelling in the default executor).
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app import metrics
+
+DISCONNECT_POLL_SECONDS = 0.25
+
+_cancel_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cancel-hook")
+
+class ClientDisconnected(Exception):
+    pass
+
+class ActiveConnection:
+    """
+    The pooled connection a worker thread is querying on, cancellable from the event loop.
+    Registration and cancel share a lock, and the connection is unregistered before it goes
+    back to the pool, so a late cancel can never hit a statement from another request.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @contextmanager
+    def running(self, conn):
+        with self._lock:
+            self._conn = conn
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._conn = None
+
+    def cancel(self):
+        with self._lock:
+            if self._conn is not None and not self._conn.closed:
+                self._conn.cancel()
+
+async def _wait_for_disconnect(request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+def _run_cancel_hook(on_cancel, what):
+    try:
+        on_cancel()
+    except Exception as e:
+        print(f"Cancel Hook Error ({what}): {e}")
+
+def _abandon(task, watcher, on_cancel, what):
+    task.cancel()
+    watcher.cancel()
+    if on_cancel:
+        # Fire and forget: the stream is already being torn down
+        _cancel_executor.submit(_run_cancel_hook, on_cancel, what)
+    metrics.incr(f"{what}_cancelled")
+
+async def guarded(request, awaitable, what, on_cancel=None):
+    """
+    Awaits `awaitable` unless the client disconnects first, in which case it is cancelled,
+    `on_cancel` runs, `<what>_cancelled` is counted, and ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        # The server cancelled the whole stream (e.g. Starlette saw the disconnect first)
+        _abandon(task, watcher, on_cancel, what)
+        raise
+
+    if task in done:
+        watcher.cancel()
+        return task.result()
+
+    _abandon(task, watcher, on_cancel, what)
+    raise ClientDisconnected()
@@ -0,0 +1,233 @@
+import os
+import re
+import time
+import itertools
+import threading
+import psycopg2
+from psycopg2.extensions import connection as PgConnection
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from contextlib import contextmanager
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))  # Per worker process
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+# Shared cache/rate-limit state gets its own small pool: those calls are made while the
+# caller already holds a main-pool connection, and must never wait on that same pool
+SHARED_STATE_POOL_MAX = int(os.getenv("SHARED_STATE_POOL_MAX", "4"))
+# Server-side cap on any single statement, so a stuck query can't pin a worker forever
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+DB_OPTIONS = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+# Optional read replicas (comma-separated DSNs) for the read-only cafe queries
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "10"))
+# Server-side prepared statements; turn off behind a transaction-mode pgbouncer
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"
+
+# Database Connection
+def get_db_connection():
+    try:
+        conn = psycopg2.connect(DATABASE_URL, options=DB_OPTIONS)
+        return conn
+    except Exception as e:
+        print(f"❌ DB Connect Error: {e}")
+        raise HTTPException(500, f"Database Connect Error: {e}")
+
+class PreparingConnection(PgConnection):
+    """Connection that remembers which statements it has PREPAREd (they live as long as the session)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class BlockingPool:
+    """
+    ThreadedConnectionPool that waits (up to DB_POOL_TIMEOUT_SECONDS) for a free connection
+    instead of raising as soon as it is exhausted.
+    """
+
+    def __init__(self, minconn, maxconn, dsn):
+        self.pool = ThreadedConnectionPool(minconn, maxconn, dsn, options=DB_OPTIONS, connection_factory=PreparingConnection)
+        self.slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, timeout=DB_POOL_TIMEOUT_SECONDS):
+        if not self.slots.acquire(timeout=timeout):
+            raise PoolError(f"No free DB connection after {timeout}s")
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            if not conn.closed:
+                conn.rollback()  # Never hand an open transaction to the next user
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.slots.release()
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+def _lazy_pool(name, minconn, maxconn):
+    # Created lazily so each gunicorn worker builds its own pools after fork
+    if name not in _pools:
+        with _pool_lock:
+            if name not in _pools:
+                try:
+                    _pools[name] = BlockingPool(minconn, maxconn, DATABASE_URL)
+                except Exception as e:
+                    print(f"❌ DB Connect Error: {e}")
+                    raise HTTPException(500, f"Database Connect Error: {e}")
+    return _pools[name]
+
+def get_pool():
+    return _lazy_pool("main", DB_POOL_MIN, DB_POOL_MAX)
+
+def get_shared_state_pool():
+    return _lazy_pool("shared_state", 1, SHARED_STATE_POOL_MAX)
+
+@contextmanager
+def _pooled(pool):
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+def get_db_cursor():
+    return _pooled(get_pool())
+
+def get_shared_state_cursor():
+    """Primary connection for app/cache.py and app/limits.py only (see SHARED_STATE_POOL_MAX)."""
+    return _pooled(get_shared_state_pool())
+
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        -- Not receiving WAL: "caught up with what it received" says nothing, so report unknown
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        -- Caught up with everything received: an idle primary isn't lag
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+class Replica:
+    """One read replica: its own pool plus a periodically refreshed lag reading."""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.pool = None
+        self.lag = None        # Seconds, None = unreachable, not streaming or not checked yet
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _check(self):
+        try:
+            if self.pool is None:
+                self.pool = BlockingPool(DB_POOL_MIN, DB_POOL_MAX, self.dsn)
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(REPLICA_LAG_QUERY)
+                    lag = cursor.fetchone()[0]
+            finally:
+                self.pool.putconn(conn)
+            if lag is None:
+                print("⚠️ Replica is not streaming WAL, skipping it")
+            self.lag = None if lag is None else float(lag)
+        except Exception as e:
+            print(f"❌ Replica Check Error: {e}")
+            self.lag = None
+
+    def healthy(self):
+        # One thread re-checks when the reading is stale; the others use the last reading
+        if time.monotonic() - self.checked_at > REPLICA_CHECK_SECONDS and self.lock.acquire(blocking=False):
+            try:
+                self._check()
+                self.checked_at = time.monotonic()
+            finally:
+                self.lock.release()
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    def mark_down(self):
+        self.lag = None
+        self.checked_at = time.monotonic()
+
+_replicas = None
+_replica_order = itertools.count()
+
+def get_replicas():
+    global _replicas
+    if _replicas is None:
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = [Replica(dsn) for dsn in DATABASE_REPLICA_URLS]
+    return _replicas
+
+def _pick_replica():
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    start = next(_replica_order)
+    for i in range(len(replicas)):
+        replica = replicas[(start + i) % len(replicas)]
+        if replica.healthy():
+            return replica
+    return None
+
+@contextmanager
+def get_read_cursor():
+    """
+    Like get_db_cursor, but for read-only work that tolerates REPLICA_MAX_LAG_SECONDS of
+    staleness: round-robins over healthy replicas and falls back to the primary.
+    """
+    replica = _pick_replica()
+    if replica is None:
+        with get_db_cursor() as conn:
+            yield conn
+        return
+
+    try:
+        conn = replica.pool.getconn()
+    except Exception as e:
+        print(f"❌ Replica Connect Error: {e}")
+        replica.mark_down()
+        with get_db_cursor() as conn:
+            yield conn
+        return
+
+    try:
+        yield conn
+    finally:
+        replica.pool.putconn(conn)
+
+_PLACEHOLDER_RE = re.compile(r"%[s%]")
+
+def _positional(query):
+    """psycopg2-style %s placeholders -> $1, $2, ... for PREPARE."""
+    counter = itertools.count(1)
+    return _PLACEHOLDER_RE.sub(lambda m: "%" if m.group() == "%%" else f"${next(counter)}", query)
+
+def execute_prepared(cursor, name, query, params, types):
+    """
+    Runs `query` as a named server-side prepared statement, so it is parsed and planned
+    once per pooled connection instead of on every call. Falls back to a plain execute on
+    connections that don't track prepared statements (e.g. from get_db_connection).
+    """
+    prepared = getattr(cursor.connection, "prepared", None)
+    if not DB_PREPARED_STATEMENTS or prepared is None:
+        cursor.execute(query, params)
+        return
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} ({', '.join(types)}) AS {_positional(query)}")
+        prepared.add(name)
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
@@ -0,0 +1,113 @@
+import os
+from datetime import datetime
+from math import exp, log
+
+from app.geo import geohash_encode
+
+# Daily upstream API calls (Places + Gemini + Geocoding) the demand scheduler may spend
+MINING_DAILY_BUDGET = int(os.getenv("MINING_DAILY_BUDGET", "500"))
+DEMAND_CELL_PRECISION = 5     # ~4.9km x 4.9km geohash cells
+DEMAND_WINDOW_DAYS = 14
+DEMAND_HALF_LIFE_DAYS = 3     # Recent demand counts more than old demand
+
+# An explicit "please add my city" is worth more than one thin search result
+REQUEST_WEIGHT = 5.0
+MISS_WEIGHT = 1.0
+PREFETCH_WEIGHT = 0.25  # Predicted movement is a hint, not a real search
+
+def record_spend(cursor, source, places_calls=0, ai_calls=0, geocode_calls=0):
+    cursor.execute("""
+        INSERT INTO mining_spend (day, source, places_calls, ai_calls, geocode_calls)
+        VALUES (CURRENT_DATE, %s, %s, %s, %s)
+        ON CONFLICT (day, source) DO UPDATE SET
+            places_calls = mining_spend.places_calls + EXCLUDED.places_calls,
+            ai_calls = mining_spend.ai_calls + EXCLUDED.ai_calls,
+            geocode_calls = mining_spend.geocode_calls + EXCLUDED.geocode_calls;
+    """, (source, places_calls, ai_calls, geocode_calls))
+
+def record_cache_miss(cursor, lat, lng, radius_km, cached_count, source="live"):
+    cursor.execute(
+        "INSERT INTO cache_misses (lat, lng, radius_km, cached_count, source) VALUES (%s, %s, %s, %s, %s)",
+        (lat, lng, radius_km, cached_count, source)
+    )
+
+def count_cache_misses_today(cursor, source):
+    cursor.execute(
+        "SELECT COUNT(*) FROM cache_misses WHERE source = %s AND created_at >= CURRENT_DATE;",
+        (source,)
+    )
+    row = cursor.fetchone()
+    return row['count'] if isinstance(row, dict) else row[0]
+
+def get_spend_today(cursor):
+    """Returns {source: {places_calls, ai_calls, geocode_calls, total}} for today."""
+    cursor.execute("""
+        SELECT source, places_calls, ai_calls, geocode_calls
+        FROM mining_spend WHERE day = CURRENT_DATE;
+    """)
+    spend = {}
+    for source, places_calls, ai_calls, geocode_calls in cursor.fetchall():
+        spend[source] = {
+            "places_calls": places_calls,
+            "ai_calls": ai_calls,
+            "geocode_calls": geocode_calls,
+            "total": places_calls + ai_calls + geocode_calls,
+        }
+    return spend
+
+def _decay(created_at, now):
+    age_days = max(0.0, (now - created_at).total_seconds() / 86400)
+    return exp(-log(2) * age_days / DEMAND_HALF_LIFE_DAYS)
+
+def aggregate_demand(cursor, precision=DEMAND_CELL_PRECISION, window_days=DEMAND_WINDOW_DAYS):
+    """
+    Buckets geocoded city requests and cache misses into geohash cells.
+    Returns {cell: score}, where each event contributes weight * time decay.
+    """
+    cursor.execute("""
+        SELECT lat, lng, created_at, %s AS weight FROM city_requests
+        WHERE lat IS NOT NULL AND created_at > NOW() - make_interval(days => %s)
+        UNION ALL
+        SELECT lat, lng, created_at, CASE WHEN source = 'prefetch' THEN %s ELSE %s END AS weight FROM cache_misses
+        WHERE created_at > NOW() - make_interval(days => %s);
+    """, (REQUEST_WEIGHT, window_days, PREFETCH_WEIGHT, MISS_WEIGHT, window_days))
+
+    now = datetime.now()
+    scores = {}
+    for lat, lng, created_at, weight in cursor.fetchall():
+        cell = geohash_encode(lat, lng, precision)
+        scores[cell] = scores.get(cell, 0.0) + weight * _decay(created_at, now)
+    return scores
+
+def queue_status(cursor, top_n=10):
+    """Snapshot for the /mining/queue dashboard."""
+    cursor.execute("SELECT status, COUNT(*) FROM mining_queue GROUP BY status;")
+    by_status = {status: count for status, count in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT cell, lat, lng, demand, cached_count, updated_at
+        FROM mining_queue WHERE status = 'queued'
+        ORDER BY demand DESC LIMIT %s;
+    """, (top_n,))
+    top = [
+        {"cell": cell, "lat": lat, "lng": lng, "demand": round(demand, 2),
+         "cached_count": cached_count, "updated_at": updated_at.isoformat() if updated_at else None}
+        for cell, lat, lng, demand, cached_count, updated_at in cursor.fetchall()
+    ]
+
+    cursor.execute("SELECT COUNT(*) FROM city_requests WHERE lat IS NULL AND NOT COALESCE(geocode_failed, FALSE);")
+    ungeocoded = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM cache_misses WHERE created_at > NOW() - INTERVAL '1 day' AND source = 'live';")
+    misses_24h = cursor.fetchone()[0]
+
+    spend = get_spend_today(cursor)
+    scheduler_spent = spend.get("scheduler", {}).get("total", 0)
+    return {
+        "queue_depth": by_status.get("queued", 0),
+        "queue_by_status": by_status,
+        "top_areas": top,
+        "pending": {"ungeocoded_requests": ungeocoded, "cache_misses_24h": misses_24h},
+        "spend_today": spend,
+        "daily_budget": MINING_DAILY_BUDGET,
+        "budget_remaining": max(0, MINING_DAILY_BUDGET - scheduler_spent),
+    }
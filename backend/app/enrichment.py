@@ -0,0 +1,424 @@
+"""
+Enrichment engine shared by the API server (live mining) and the bulk miners.
+
+One place for: the Places searchNearby call, the Gemini prompt, schema-constrained
+JSON output, validation/coercion of the AI answer, and the DB insert.
+"""
+import os
+import json
+import re
+import time
+import asyncio
+from typing import List, Optional
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError, field_validator
+
+from app.hours import week_bitmap
+
+load_dotenv()
+
+MAPS_KEY = os.getenv("GMAPS_KEY")
+AI_KEY = os.getenv("GEMINI_API_KEY")
+AI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+AI_MODEL_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{AI_MODEL}:generateContent"
+
+AI_MAX_ATTEMPTS = 3
+AI_TIMEOUT_SECONDS = 15
+AI_BACKOFF_SECONDS = 2     # Doubles on every 429
+REVIEW_CHAR_LIMIT = 30000  # ~7-8k tokens, well inside the model window
+
+PLACES_FIELD_MASK = "places.id,places.displayName,places.formattedAddress,places.location,places.rating,places.priceLevel,places.regularOpeningHours,places.utcOffsetMinutes,places.reviews"
+
+# --- Allowed values (single source for the prompt schema and the validator) ---
+ENUMS = {
+    "noise_level": ["Quiet", "Moderate", "Loud"],
+    "wifi": ["Fast", "Spotty", "None"],
+    "outlets_level": ["Many", "Scarce", "None"],
+    "price_perception": ["Cheap", "Fair", "Overpriced"],
+    "comfort_level": ["Cozy", "Spacious", "Hard Seats"],
+    "food_type": ["Full Meals", "Pastries", "Coffee Only"],
+    "group_suitability": ["Good for Groups", "Best for Pairs", "Solo Only"],
+    "bathroom_status": ["Public", "Code Required", "None", "Unknown"],
+}
+BEST_FOR = ["Study", "Social", "Group Work", "Date", "Lunch"]
+
+# Words the model sometimes uses instead of the exact enum value
+_SYNONYMS = {
+    "noise_level": {"silent": "Quiet", "calm": "Quiet", "peaceful": "Quiet", "medium": "Moderate",
+                    "noisy": "Loud", "busy": "Loud", "lively": "Loud"},
+    "wifi": {"good": "Fast", "strong": "Fast", "reliable": "Fast", "slow": "Spotty",
+             "weak": "Spotty", "unreliable": "Spotty", "no wifi": "None", "no": "None"},
+    "outlets_level": {"plenty": "Many", "lots": "Many", "few": "Scarce", "limited": "Scarce", "no outlets": "None"},
+    "price_perception": {"inexpensive": "Cheap", "affordable": "Cheap", "reasonable": "Fair",
+                         "moderate": "Fair", "pricey": "Overpriced", "expensive": "Overpriced"},
+    "comfort_level": {"comfortable": "Cozy", "comfy": "Cozy", "roomy": "Spacious", "uncomfortable": "Hard Seats"},
+    "food_type": {"meals": "Full Meals", "full menu": "Full Meals", "bakery": "Pastries", "snacks": "Pastries",
+                  "drinks only": "Coffee Only", "coffee": "Coffee Only"},
+    "group_suitability": {"groups": "Good for Groups", "pairs": "Best for Pairs", "solo": "Solo Only"},
+    "bathroom_status": {"yes": "Public", "available": "Public", "code": "Code Required", "no": "None"},
+}
+
+def _coerce_enum(value, field):
+    if not isinstance(value, str):
+        return None
+    allowed = ENUMS[field]
+    key = value.strip().lower()
+    for option in allowed:
+        if key == option.lower():
+            return option
+    if key in _SYNONYMS.get(field, {}):
+        return _SYNONYMS[field][key]
+    # "Quiet-ish", "Mostly quiet" etc.
+    for option in allowed:
+        if option.lower() in key:
+            return option
+    return None
+
+class VibeExtraction(BaseModel):
+    noise_level: Optional[str] = None
+    wifi: Optional[str] = None
+    outlets_level: Optional[str] = None
+    price_perception: Optional[str] = None
+    comfort_level: Optional[str] = None
+    food_type: Optional[str] = None
+    best_for: List[str] = []
+    group_suitability: Optional[str] = None
+    is_late_night: bool = False
+    bathroom_status: Optional[str] = None
+    seating_tip: Optional[str] = None
+    vibes: List[str] = []
+    summary: Optional[str] = None
+
+    @field_validator(*ENUMS.keys(), mode="before")
+    @classmethod
+    def coerce_enum(cls, v, info):
+        return _coerce_enum(v, info.field_name)
+
+    @field_validator("best_for", mode="before")
+    @classmethod
+    def coerce_best_for(cls, v):
+        if isinstance(v, str):
+            v = [v]
+        if not isinstance(v, list):
+            return []
+        lookup = {b.lower(): b for b in BEST_FOR}
+        return [lookup[x.strip().lower()] for x in v if isinstance(x, str) and x.strip().lower() in lookup]
+
+    @field_validator("vibes", mode="before")
+    @classmethod
+    def coerce_vibes(cls, v):
+        if isinstance(v, str):
+            v = [v]
+        if not isinstance(v, list):
+            return []
+        return [x.strip() for x in v if isinstance(x, str) and x.strip()]
+
+    @field_validator("is_late_night", mode="before")
+    @classmethod
+    def coerce_bool(cls, v):
+        if isinstance(v, str):
+            return v.strip().lower() in ("true", "yes", "1")
+        return bool(v)
+
+# Gemini responseSchema (OpenAPI subset) so the model can only emit this shape
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        **{field: {"type": "STRING", "enum": options} for field, options in ENUMS.items()},
+        "best_for": {"type": "ARRAY", "items": {"type": "STRING", "enum": BEST_FOR}},
+        "is_late_night": {"type": "BOOLEAN"},
+        "seating_tip": {"type": "STRING"},
+        "vibes": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "summary": {"type": "STRING"},
+    },
+    "required": list(ENUMS.keys()) + ["best_for", "is_late_night", "seating_tip", "vibes", "summary"],
+}
+
+PROMPT_TEMPLATE = """
+Analyze these user reviews for a Study Spot App.
+
+YOUR GOAL: Extract attributes for students/remote workers.
+CRITICAL INSTRUCTION: DO NOT RETURN "Unknown" unless nothing at all hints at it.
+
+You must INFER values based on context.
+Examples:
+- "People working on laptops" -> Implies 'outlets_level: Many' and 'wifi: Fast'.
+- "Great place to write my essay" -> Implies 'noise_level: Moderate' or 'Quiet'.
+- "Expensive latte" -> Implies 'price_perception: Overpriced'.
+- "Stayed for 4 hours" -> Implies 'comfort_level: Cozy'.
+
+Field notes:
+- is_late_night: true if reviews mention being open late or good for evenings.
+- seating_tip: Specific tip (e.g. 'Back booth has power'). Max 8 words.
+- vibes: 2-4 short tags.
+- summary: 1 short sentence focusing on study suitability.
+
+Review Data:
+{review_context}
+"""
+
+def get_all_reviews_text(reviews_list):
+    """Combines ALL reviews into a single block of text for the AI."""
+    if not reviews_list: return None
+    all_text = ""
+    for r in reviews_list:
+        text = r.get('text', {}).get('text', '')
+        if text:
+            all_text += f"- {text}\n"
+    return all_text[:REVIEW_CHAR_LIMIT] or None
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def parse_vibe_response(raw_text):
+    """
+    Parses and validates the model's JSON in one pass. With responseSchema the text is
+    already bare JSON; fences and a top-level list are tolerated locally so a cosmetic
+    formatting slip never costs another round-trip.
+    """
+    text = _FENCE_RE.sub("", raw_text.strip())
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        # Last resort: the outermost {...} in the text
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            parsed = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+
+    if isinstance(parsed, list):
+        parsed = parsed[0] if parsed and isinstance(parsed[0], dict) else None
+    if not isinstance(parsed, dict):
+        return None
+
+    try:
+        return VibeExtraction.model_validate(parsed).model_dump()
+    except ValidationError as e:
+        print(f"AI Validation Error: {e}")
+        return None
+
+def build_ai_request(review_context):
+    return {
+        "contents": [{"parts": [{"text": PROMPT_TEMPLATE.format(review_context=review_context)}]}],
+        "generationConfig": {
+            "responseMimeType": "application/json",
+            "responseSchema": RESPONSE_SCHEMA,
+        },
+    }
+
+def _ai_payload(reviews_list):
+    """Returns the request body, or None (with a log line) if there is nothing to send."""
+    review_context = get_all_reviews_text(reviews_list)
+    if not review_context:
+        print(f"AI Skip: No usable review text ({len(reviews_list or [])} raw reviews from Places API)")
+        return None
+    if not AI_KEY:
+        print("AI Error: GEMINI_API_KEY is not set")
+        return None
+    return build_ai_request(review_context)
+
+def _ai_result(status_code, body_json, body_text):
+    """
+    Interprets one Gemini response. Returns ("done", vibe_or_None) or ("retry", None).
+    Only 429/5xx are retried; a response that fails to parse is not re-requested since
+    the same prompt would mostly fail the same way.
+    """
+    if status_code == 200:
+        try:
+            result = body_json()
+            if 'candidates' not in result:
+                print(f"AI Response Missing Candidates: {result}")
+                return "done", None
+            raw_text = result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, TypeError, ValueError):
+            # Blocked answers (SAFETY/RECITATION) come back without content; bodies can be non-JSON
+            print(f"AI Response Unusable: {body_text()[:500]}")
+            return "done", None
+        vibe = parse_vibe_response(raw_text)
+        if vibe is None:
+            print(f"AI Parse Error - Raw: {raw_text[:500]}")
+        return "done", vibe
+    if status_code == 429 or status_code >= 500:
+        return "retry", None
+    print(f"AI Request Failed: {status_code} - {body_text()[:500]}")
+    return "done", None
+
+def get_vibe_from_ai(reviews_list):
+    """Sends the review context to Gemini and returns a validated vibe dict, or None."""
+    data = _ai_payload(reviews_list)
+    if data is None:
+        return None
+
+    backoff = AI_BACKOFF_SECONDS
+    for attempt in range(AI_MAX_ATTEMPTS):
+        try:
+            response = requests.post(f"{AI_MODEL_URL}?key={AI_KEY}", json=data, timeout=AI_TIMEOUT_SECONDS)
+            outcome, vibe = _ai_result(response.status_code, response.json, lambda: response.text)
+            if outcome == "done":
+                return vibe
+            print(f"AI {response.status_code} (attempt {attempt + 1}/{AI_MAX_ATTEMPTS}), retrying in {backoff}s...")
+            time.sleep(backoff)
+            backoff *= 2
+        except requests.RequestException as e:
+            print(f"AI Exception: {e}")
+    return None
+
+async def get_vibe_from_ai_async(http, reviews_list):
+    """
+    Async twin of get_vibe_from_ai on an httpx.AsyncClient. Cancelling the awaiting
+    task aborts the in-flight request and any backoff sleep.
+    """
+    data = _ai_payload(reviews_list)
+    if data is None:
+        return None
+
+    backoff = AI_BACKOFF_SECONDS
+    for attempt in range(AI_MAX_ATTEMPTS):
+        try:
+            response = await http.post(f"{AI_MODEL_URL}?key={AI_KEY}", json=data, timeout=AI_TIMEOUT_SECONDS)
+            outcome, vibe = _ai_result(response.status_code, response.json, lambda: response.text)
+            if outcome == "done":
+                return vibe
+            print(f"AI {response.status_code} (attempt {attempt + 1}/{AI_MAX_ATTEMPTS}), retrying in {backoff}s...")
+            await asyncio.sleep(backoff)
+            backoff *= 2
+        except httpx.HTTPError as e:
+            print(f"AI Exception: {e}")
+    return None
+
+def _places_request(lat, lng, radius_km, max_count, field_mask=PLACES_FIELD_MASK):
+    url = "https://places.googleapis.com/v1/places:searchNearby"
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": MAPS_KEY,
+        "X-Goog-FieldMask": field_mask
+    }
+    body = {
+        "includedTypes": ["cafe", "coffee_shop"],
+        "maxResultCount": max_count,
+        "locationRestriction": {
+            "circle": {
+                "center": {"latitude": lat, "longitude": lng},
+                "radius": radius_km * 1000.0
+            }
+        }
+    }
+    return url, headers, body
+
+def search_places_nearby(lat, lng, radius_km, max_count=20, field_mask=PLACES_FIELD_MASK):
+    """Places in the circle, [] when there are none, None when the search failed."""
+    url, headers, body = _places_request(lat, lng, radius_km, max_count, field_mask)
+    try:
+        response = requests.post(url, headers=headers, json=body, timeout=10)
+        if response.status_code == 200:
+            return response.json().get('places', [])
+        print(f"❌ Google Places API Error: {response.status_code} - {response.text[:300]}")
+    except Exception as e:
+        print(f"❌ Google Places API Error: {e}")
+    return None
+
+async def search_places_nearby_async(http, lat, lng, radius_km, max_count=20, field_mask=PLACES_FIELD_MASK):
+    url, headers, body = _places_request(lat, lng, radius_km, max_count, field_mask)
+    try:
+        response = await http.post(url, headers=headers, json=body, timeout=10)
+        if response.status_code == 200:
+            return response.json().get('places', [])
+        print(f"❌ Google Places API Error: {response.status_code} - {response.text[:300]}")
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"❌ Google Places API Error: {e}")
+    return None
+
+def get_place_details(google_place_id, field_mask):
+    """Place Details for one place, limited to field_mask (no "places." prefix). None on failure."""
+    url = f"https://places.googleapis.com/v1/places/{google_place_id}"
+    headers = {"X-Goog-Api-Key": MAPS_KEY, "X-Goog-FieldMask": field_mask}
+    try:
+        response = requests.get(url, headers=headers, timeout=10)
+        if response.status_code == 200:
+            return response.json()
+        print(f"❌ Google Place Details Error: {response.status_code} - {response.text[:300]}")
+    except Exception as e:
+        print(f"❌ Google Place Details Error: {e}")
+    return None
+
+PRICE_LEVELS = {
+    "PRICE_LEVEL_FREE": 0,
+    "PRICE_LEVEL_INEXPENSIVE": 1,
+    "PRICE_LEVEL_MODERATE": 2,
+    "PRICE_LEVEL_EXPENSIVE": 3,
+    "PRICE_LEVEL_VERY_EXPENSIVE": 4,
+}
+
+def price_level_to_int(price_level):
+    """Google priceLevel enum -> 0-4, or None when Google has no price (or says UNSPECIFIED)."""
+    return PRICE_LEVELS.get(price_level)
+
+def vibe_to_response(vibe_data):
+    """Maps AI output onto the place_vibes column names the API returns."""
+    return {
+        "summary": vibe_data.get('summary'),
+        "vibe_tags": vibe_data.get('vibes', []),
+        "best_for": vibe_data.get('best_for', []),
+        "noise_level": vibe_data.get('noise_level'),
+        "wifi_quality": vibe_data.get('wifi'),
+        "outlets_level": vibe_data.get('outlets_level'),
+        "comfort_level": vibe_data.get('comfort_level'),
+        "food_type": vibe_data.get('food_type'),
+        "seating_tip": vibe_data.get('seating_tip'),
+        "busyness_info": None,
+        "group_suitability": vibe_data.get('group_suitability'),
+        "is_late_night": vibe_data.get('is_late_night'),
+        "time_limit_status": None,
+        "bathroom_status": vibe_data.get('bathroom_status'),
+        "has_natural_light": False
+    }
+
+def save_place(cursor, place, vibe_data):
+    """
+    Inserts a mined place and its vibes. Caller owns the transaction (commit/rollback).
+    Returns the new places.id.
+    """
+    cursor.execute("""
+        INSERT INTO places (google_place_id, name, address, location, rating, price_level, open_week, utc_offset_minutes)
+        VALUES (%s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s, %s, %s)
+        RETURNING id;
+    """, (
+        place.get('id'), place.get('displayName', {}).get('text'), place.get('formattedAddress'),
+        place['location']['longitude'], place['location']['latitude'],
+        place.get('rating'), price_level_to_int(place.get('priceLevel')),
+        week_bitmap(place.get('regularOpeningHours')), place.get('utcOffsetMinutes')
+    ))
+    res = cursor.fetchone()
+    new_place_id = res['id'] if isinstance(res, dict) else res[0]
+
+    cursor.execute("""
+        INSERT INTO place_vibes
+        (place_id, vibe_tags, best_for, noise_level, wifi_quality, outlets_level, comfort_level,
+         food_type, seating_tip, busyness_info, group_suitability,
+         summary, is_late_night, time_limit_status, bathroom_status, has_natural_light, price_perception)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+    """, (
+        new_place_id,
+        vibe_data.get('vibes', []),
+        vibe_data.get('best_for', []),
+        vibe_data.get('noise_level'),
+        vibe_data.get('wifi'),
+        vibe_data.get('outlets_level'),
+        vibe_data.get('comfort_level'),
+        vibe_data.get('food_type'),
+        vibe_data.get('seating_tip'),
+        None,
+        vibe_data.get('group_suitability'),
+        vibe_data.get('summary'),
+        vibe_data.get('is_late_night'),
+        None, # time_limit_status
+        vibe_data.get('bathroom_status'),
+        False,
+        vibe_data.get('price_perception')
+    ))
+    return new_place_id
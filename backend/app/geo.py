@@ -0,0 +1,211 @@
+from math import radians, degrees, cos, sin, asin, atan2, sqrt, pi
+
+EARTH_RADIUS_KM = 6371
+
+def haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    return c * EARTH_RADIUS_KM
+
+def offset_point(lat, lng, north_km, east_km):
+    """Moves a point by a small north/east offset (flat-earth approximation, fine below ~50km)."""
+    new_lat = lat + degrees(north_km / EARTH_RADIUS_KM)
+    new_lng = lng + degrees(east_km / (EARTH_RADIUS_KM * cos(radians(lat))))
+    return new_lat, new_lng
+
+def circle_bbox(lat, lng, radius_km):
+    """
+    Bounds of a circle as (south, north, [(west, east), ...]): two lng ranges where it crosses
+    the antimeridian, one covering every longitude when it reaches a pole or around the globe.
+    """
+    d_lat = radius_km / 111.0
+    south, north = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+    # Widest longitude span of the circle (at its poleward edge, not at its center latitude)
+    spread = sin(min(radius_km / EARTH_RADIUS_KM, pi / 2)) / max(cos(radians(lat)), 1e-9)
+    d_lng = 180.0 if spread >= 1.0 else degrees(asin(spread)) * 1.001
+    if d_lng >= 180.0 or south <= -90.0 or north >= 90.0:
+        return south, north, [(-180.0, 180.0)]
+    if lng - d_lng < -180.0:
+        return south, north, [(-180.0, lng + d_lng), (lng - d_lng + 360.0, 180.0)]
+    if lng + d_lng > 180.0:
+        return south, north, [(-180.0, lng + d_lng - 360.0), (lng - d_lng, 180.0)]
+    return south, north, [(lng - d_lng, lng + d_lng)]
+
+def radius_for_density(density_per_km2, target_results=15, min_km=0.2, max_km=5.0):
+    """
+    Circle radius expected to hold ~target_results places at the given density.
+    searchNearby caps at 20 results, so aim a bit below that to avoid truncated tiles.
+    """
+    if not density_per_km2 or density_per_km2 <= 0:
+        return max_km
+    r = sqrt(target_results / (pi * density_per_km2))
+    return max(min_km, min(max_km, r))
+
+def circle_touches_bbox(lat, lng, radius_km, south, west, north, east):
+    """True when the circle overlaps the bbox (its nearest point in the box is within radius_km)."""
+    near_lat = min(max(lat, south), north)
+    near_lng = min(max(lng, west), east)
+    return haversine(lng, lat, near_lng, near_lat) <= radius_km
+
+def hex_tiles(south, west, north, east, radius_km):
+    """
+    Covers a bounding box with circles of radius_km laid out on a hex grid.
+    Hex packing needs ~23% fewer circles than a square grid for full coverage.
+    Returns a list of (lat, lng) centers, only ones whose circle overlaps the box.
+    """
+    if haversine(west, south, east, north) / 2 <= radius_km:
+        # One circle around the center already covers the whole box
+        return [((south + north) / 2, (west + east) / 2)]
+
+    col_step = sqrt(3) * radius_km   # Horizontal spacing between centers
+    row_step = 1.5 * radius_km       # Vertical spacing between rows
+
+    tiles = []
+    lat = south
+    row = 0
+    while True:
+        # Shift every other row by half a column so circles interlock (starting outside the
+        # west edge, or the corner between two rows would be left uncovered)
+        shift = -col_step / 2 if row % 2 else 0
+        lng = offset_point(lat, west, 0, shift)[1]
+        while True:
+            # The last column/row may overshoot the box; keep it only if it still reaches in
+            if circle_touches_bbox(lat, lng, radius_km, south, west, north, east):
+                tiles.append((lat, lng))
+            if lng >= east: break
+            lng = offset_point(lat, lng, 0, col_step)[1]
+        if lat >= north: break
+        lat = offset_point(lat, west, row_step, 0)[0]
+        row += 1
+    return tiles
+
+def split_tile(lat, lng, radius_km):
+    """
+    Replaces one circle with 7 circles of half the radius (one center + a ring of 6),
+    which is the minimal covering of a circle by 7 equal circles.
+    """
+    child_r = radius_km / 2
+    ring = sqrt(3) / 2 * radius_km
+    children = [(lat, lng, child_r)]
+    for i in range(6):
+        angle = radians(60 * i + 30)
+        c_lat, c_lng = offset_point(lat, lng, ring * sin(angle), ring * cos(angle))
+        children.append((c_lat, c_lng, child_r))
+    return children
+
+def point_in_polygon(lat, lng, polygon):
+    """Ray-casting test. polygon is a list of (lng, lat) pairs, GeoJSON order."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i][0], polygon[i][1]
+        xj, yj = polygon[j][0], polygon[j][1]
+        if (yi > lat) != (yj > lat):
+            x_cross = (xj - xi) * (lat - yi) / (yj - yi) + xi
+            if lng < x_cross:
+                inside = not inside
+        j = i
+    return inside
+
+def circle_touches_polygon(lat, lng, radius_km, polygon):
+    """Cheap conservative check: center or any of 8 rim points inside the polygon."""
+    if point_in_polygon(lat, lng, polygon):
+        return True
+    for i in range(8):
+        angle = radians(45 * i)
+        p_lat, p_lng = offset_point(lat, lng, radius_km * sin(angle), radius_km * cos(angle))
+        if point_in_polygon(p_lat, p_lng, polygon):
+            return True
+    return False
+
+def polygon_bbox(polygon):
+    lngs = [p[0] for p in polygon]
+    lats = [p[1] for p in polygon]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+# --- Geohash (used to bucket demand and cache entries by area) ---
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat, lng, precision=6):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # Geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        rng, val = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if val >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+def geohash_bbox(cell):
+    """Returns (south, west, north, east) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for ch in cell:
+        idx = _GEOHASH_BASE32.index(ch)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (idx >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+def geohash_center(cell):
+    south, west, north, east = geohash_bbox(cell)
+    return (south + north) / 2, (west + east) / 2
+
+def geohash_neighbors(cell):
+    """The 8 surrounding cells of the same precision, clockwise from north."""
+    south, west, north, east = geohash_bbox(cell)
+    d_lat = north - south
+    d_lng = east - west
+    lat, lng = (south + north) / 2, (west + east) / 2
+    out = []
+    for dy, dx in [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]:
+        n_lat = max(-89.999999, min(89.999999, lat + dy * d_lat))
+        n_lng = (lng + dx * d_lng + 180) % 360 - 180
+        out.append(geohash_encode(n_lat, n_lng, len(cell)))
+    return out
+
+def geohash_precision_for_radius(radius_km):
+    """Coarsest precision whose cells are no wider than roughly the search radius."""
+    # Approximate cell widths (km) at precisions 4..7
+    for precision, width_km in [(4, 39.1), (5, 4.9), (6, 1.2), (7, 0.15)]:
+        if width_km <= radius_km * 2:
+            return precision
+    return 7
+
+def geohash_cells_ahead(cell, heading_deg, spread_deg=60):
+    """
+    Neighbouring cells that lie roughly in the direction of travel (heading in degrees,
+    0 = north, 90 = east), ordered best-aligned first.
+    """
+    lat, lng = geohash_center(cell)
+    scored = []
+    for n in geohash_neighbors(cell):
+        n_lat, n_lng = geohash_center(n)
+        bearing = degrees(atan2((n_lng - lng) * cos(radians(lat)), n_lat - lat)) % 360
+        diff = abs((bearing - heading_deg + 180) % 360 - 180)
+        if diff <= spread_deg:
+            scored.append((diff, n))
+    return [n for _, n in sorted(scored)]
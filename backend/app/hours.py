@@ -0,0 +1,68 @@
+"""
+Weekly opening hours as a bitmap, for "open at" filtering inside SQL.
+
+A week is 2016 slots of 5 minutes in the place's local time, starting Sunday 00:00
+(the same day numbering as Places regularOpeningHours). Bit n is set when the place
+is open for the whole of slot n, so partial slots round towards "closed". The bitmap
+is 252 bytes stored inline on places.open_week, next to utc_offset_minutes; checking
+it is a single get_bit() on a row the spatial query already reads.
+"""
+from datetime import datetime, timezone
+
+SLOT_MINUTES = 5
+WEEK_MINUTES = 7 * 24 * 60
+WEEK_SLOTS = WEEK_MINUTES // SLOT_MINUTES
+
+def _minute_of_week(point):
+    return point.get('day', 0) * 1440 + point.get('hour', 0) * 60 + point.get('minute', 0)
+
+def week_bitmap(regular_opening_hours):
+    """Places regularOpeningHours -> bytes, or None when Google has no hours."""
+    periods = (regular_opening_hours or {}).get('periods')
+    if not periods:
+        return None
+
+    bits = bytearray(WEEK_SLOTS // 8)
+    for period in periods:
+        start = _minute_of_week(period.get('open', {}))
+        if 'close' not in period:
+            # Open 24/7 is reported as a single period with no close
+            end = start + WEEK_MINUTES
+        else:
+            end = _minute_of_week(period['close'])
+            if end <= start:
+                end += WEEK_MINUTES  # Wraps past Saturday midnight
+        first = -(-start // SLOT_MINUTES)
+        last = end // SLOT_MINUTES
+        for slot in range(first, last):
+            slot %= WEEK_SLOTS
+            bits[slot // 8] |= 1 << (slot % 8)  # Postgres get_bit(bytea) numbers bits LSB-first
+    return bytes(bits)
+
+def parse_open_at(value):
+    """
+    "now" or an ISO datetime. Returns (minute_of_week, use_offset):
+    an aware time is an instant (minute in UTC, shifted by each place's offset),
+    a naive one is a wall-clock time in each place's own timezone.
+    """
+    dt = datetime.now(timezone.utc) if value == "now" else datetime.fromisoformat(value)
+    use_offset = dt.tzinfo is not None
+    if use_offset:
+        dt = dt.astimezone(timezone.utc)
+    day = (dt.weekday() + 1) % 7  # Python: Monday=0, Places: Sunday=0
+    return day * 1440 + dt.hour * 60 + dt.minute, use_offset
+
+# Evaluates against a places row aliased "p"; params: (minute_of_week, use_offset)
+OPEN_AT_SQL = f"""
+    get_bit(p.open_week,
+        ((%s + CASE WHEN %s THEN COALESCE(p.utc_offset_minutes, 0) ELSE 0 END) %% {WEEK_MINUTES} + {WEEK_MINUTES})
+        %% {WEEK_MINUTES} / {SLOT_MINUTES}) = 1
+"""
+
+def is_open_at(open_week, utc_offset_minutes, minute_of_week, use_offset):
+    """Python twin of OPEN_AT_SQL, for places that haven't been saved yet."""
+    if not open_week:
+        return False
+    minute = minute_of_week + ((utc_offset_minutes or 0) if use_offset else 0)
+    slot = (minute % WEEK_MINUTES) // SLOT_MINUTES
+    return bool(open_week[slot // 8] & (1 << (slot % 8)))
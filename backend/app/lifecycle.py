@@ -0,0 +1,57 @@
+"""
+Graceful shutdown for SSE streams.
+
+On SIGTERM/SIGINT the server stops accepting connections and waits (up to the
+graceful timeout) for open responses to finish. Live-mining streams can run for a
+long time, so we set `draining` first; streams check it between places, stop
+mining, and close with `event: done` while the server is still waiting on them.
+"""
+import signal
+import threading
+
+draining = threading.Event()
+
+_active_streams = 0
+_active_lock = threading.Lock()
+
+def stream_started():
+    global _active_streams
+    with _active_lock:
+        _active_streams += 1
+
+def stream_finished():
+    global _active_streams
+    with _active_lock:
+        _active_streams -= 1
+
+def active_streams():
+    return _active_streams
+
+def install_drain_handler():
+    """Chains onto the server's own exit handlers. Only possible in the main thread (app startup)."""
+    if threading.current_thread() is not threading.main_thread():
+        # e.g. TestClient runs startup in a worker thread; signal.signal would raise there
+        print("⚠️ Not on the main thread, skipping the drain signal handler")
+        return
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        # Only chain onto a real Python handler; replacing SIG_DFL would stop the process from exiting
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            if not draining.is_set():
+                print(f"🛑 Signal {signum}: draining {active_streams()} open streams...")
+            draining.set()
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+async def track_stream(stream):
+    """Wraps an async generator so it is counted in active_streams() while open."""
+    stream_started()
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        stream_finished()
@@ -0,0 +1,66 @@
+import time
+import threading
+
+from app.cache import SHARED_STATE_BACKEND
+from app.db import get_shared_state_cursor
+
+class TokenBucket:
+    """Allows `rate` events per `per_seconds` on average, with bursts up to `rate`."""
+
+    def __init__(self, rate, per_seconds):
+        self.capacity = float(rate)
+        self.tokens = float(rate)
+        self.refill_per_second = rate / per_seconds
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+            self.updated_at = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return True
+            return False
+
+class PostgresTokenBucket:
+    """TokenBucket whose state lives in Postgres, so the limit holds across all workers."""
+
+    def __init__(self, name, rate, per_seconds):
+        self.name = name
+        self.capacity = float(rate)
+        self.refill_per_second = rate / per_seconds
+
+    def take(self, n=1):
+        # Refill and spend in one statement; the row lock serializes concurrent workers
+        try:
+            return self._take(n)
+        except Exception as e:
+            print(f"Rate Limit Error: {e}")
+            return False  # Fail closed: the limit protects upstream budgets
+
+    def _take(self, n):
+        with get_shared_state_cursor() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO rate_limits (name, tokens, updated_at) VALUES (%s, %s, NOW())
+                    ON CONFLICT (name) DO NOTHING;
+                """, (self.name, self.capacity))
+                cursor.execute("""
+                    UPDATE rate_limits SET
+                        tokens = LEAST(%s, tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * %s) - %s,
+                        updated_at = NOW()
+                    WHERE name = %s
+                      AND LEAST(%s, tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * %s) >= %s
+                    RETURNING tokens;
+                """, (self.capacity, self.refill_per_second, n, self.name,
+                      self.capacity, self.refill_per_second, n))
+                allowed = cursor.fetchone() is not None
+            conn.commit()
+        return allowed
+
+def make_token_bucket(name, rate, per_seconds):
+    if SHARED_STATE_BACKEND == "postgres":
+        return PostgresTokenBucket(name, rate, per_seconds)
+    return TokenBucket(rate, per_seconds)
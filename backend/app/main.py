@@ -1,27 +1,43 @@
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import os
-import time
 import json
-import psycopg2
-from contextlib import contextmanager
+import asyncio
+import httpx
 from psycopg2.extras import RealDictCursor
+from psycopg2.errors import QueryCanceled
 import requests
 from dotenv import load_dotenv
 
+from app.db import get_db_connection, get_db_cursor, get_read_cursor
+from app.geo import haversine, geohash_encode, geohash_center, geohash_neighbors, geohash_cells_ahead
+from app.enrichment import get_vibe_from_ai_async, search_places_nearby_async, save_place, price_level_to_int, vibe_to_response
+from app.demand import record_cache_miss, record_spend, queue_status, count_cache_misses_today
+from app.semantic import SemanticSearch
+from app.nearby import VIBE_FIELDS, nearby_rows, rows_by_google_ids, invalidate_around, response_cell, is_warm, warm_around, cell_coverage, COVERAGE_CELL_PRECISION, RESPONSE_CACHE_PER_PROCESS
+from app.limits import make_token_bucket
+from app.lifecycle import draining, install_drain_handler, track_stream, active_streams
+from app import singleflight, metrics
+from app.cancellation import guarded, ClientDisconnected, ActiveConnection
+from app.hours import parse_open_at, is_open_at, week_bitmap
+from app.snapshot import SnapshotReader
+
 load_dotenv()
 app = FastAPI()
 
-# --- CONFIGURATION for AI & Maps ---
+# --- CONFIGURATION for Maps ---
 MAPS_KEY = os.getenv("GMAPS_KEY")
-AI_KEY = os.getenv("GEMINI_API_KEY")
-AI_MODEL_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-3.6-flash:generateContent"
-DATABASE_URL = os.getenv("DATABASE_URL")
 MIN_CACHED_RESULTS = 15  # Skip live Google/Gemini mining if we already have at least this many cached cafes nearby
 
+# --- Prefetch budget ---
+PREFETCH_MAX_CELLS = 8  # Per request
+PREFETCH_CELLS_PER_MINUTE = int(os.getenv("PREFETCH_CELLS_PER_MINUTE", "120"))  # DB warm-ups across all clients
+PREFETCH_DAILY_QUEUE_CAP = int(os.getenv("PREFETCH_DAILY_QUEUE_CAP", "200"))  # Low-priority mining hints per day
+prefetch_budget = make_token_bucket("prefetch", PREFETCH_CELLS_PER_MINUTE, 60)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,127 +46,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-MAPS_KEY = os.getenv("GMAPS_KEY")
-DATABASE_URL = os.getenv("DATABASE_URL")
+_http_client = None
+
+def get_http_client():
+    # One pooled async client per worker for Places/Gemini calls
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    return _http_client
+
+@app.on_event("startup")
+def on_startup():
+    install_drain_handler()
+    # Built now rather than on the first /cafes/search (only recent places when there's a snapshot)
+    semantic_search.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if _http_client is not None:
+        await _http_client.aclose()
+
+@app.get("/metrics")
+def get_metrics():
+    return {"pid": os.getpid(), "active_streams": active_streams(), "counters": metrics.snapshot()}
+
+@app.get("/health")
+def health():
+    # Load balancers should stop routing here as soon as draining starts
+    if draining.is_set():
+        raise HTTPException(503, "Draining")
+    return {"status": "ok", "pid": os.getpid(), "active_streams": active_streams()}
 
 def get_coordinates_from_address(address: str):
     if not MAPS_KEY: return None
     try:
-        resp = requests.get("https://maps.googleapis.com/maps/api/geocode/json", params={"address": address, "key": MAPS_KEY})
+        resp = requests.get("https://maps.googleapis.com/maps/api/geocode/json", params={"address": address, "key": MAPS_KEY}, timeout=10)
         data = resp.json()
         if data['status'] != 'OK': return None
         loc = data['results'][0]['geometry']['location']
         return loc['lat'], loc['lng']
     except: return None
 
-# --- AI Miner Helpers ---
-def get_all_reviews_text(reviews_list):
-    if not reviews_list: return None
-    all_text = ""
-    for r in reviews_list:
-        text = r.get('text', {}).get('text', '')
-        if text:
-            all_text += f"- {text}\n"
-    return all_text[:30000]
-
-def get_vibe_from_ai(reviews_list):
-    review_context = get_all_reviews_text(reviews_list)
-    if not review_context:
-        print(f"AI Skip: No usable review text ({len(reviews_list or [])} raw reviews from Places API)")
-        return None
-
-    prompt_text = f"""
-    Analyze these user reviews for a Study Spot App.
-    YOUR GOAL: Extract attributes for students/remote workers.
-    CRITICAL INSTRUCTION: DO NOT RETURN "Unknown".
-    You must INFER values based on context. 
-    Review Data:
-    {review_context}
-    
-    Return strictly VALID JSON. Return a SINGLE JSON object.
-    Output format:
-    {{
-        "noise_level": "Quiet" | "Moderate" | "Loud",
-        "wifi": "Fast" | "Spotty" | "None",
-        "outlets_level": "Many" | "Scarce" | "None",
-        "price_perception": "Cheap" | "Fair" | "Overpriced",
-        "comfort_level": "Cozy" | "Spacious" | "Hard Seats",
-        "food_type": "Full Meals" | "Pastries" | "Coffee Only",
-        "best_for": ["Study", "Social", "Group Work", "Date", "Lunch"],
-        "group_suitability": "Good for Groups" | "Best for Pairs" | "Solo Only",
-        "is_late_night": true/false,
-        "bathroom_status": "Public" | "Code Required" | "None" | "Unknown",
-        "seating_tip": "Specific tip (e.g. 'Back booth has power'). Max 8 words.",
-        "vibes": ["tag1", "tag2"],
-        "summary": "1 short sentence summary focusing on study suitability."
-    }}
-    """
-    
-    headers = {"Content-Type": "application/json"}
-    data = {"contents": [{"parts": [{"text": prompt_text}]}]}
-    
-    if not AI_KEY:
-        print("AI Error: GEMINI_API_KEY is not set")
-        return None
-
-    for attempt in range(3):
-        try:
-            response = requests.post(f"{AI_MODEL_URL}?key={AI_KEY}", headers=headers, json=data, timeout=15)
-            if response.status_code == 200:
-                result = response.json()
-                if 'candidates' in result:
-                    raw_text = result['candidates'][0]['content']['parts'][0]['text']
-                    clean_json = raw_text.replace("```json", "").replace("```", "").strip()
-                    try:
-                        parsed = json.loads(clean_json)
-                    except json.JSONDecodeError as e:
-                        print(f"AI JSON Parse Error: {e} - Raw: {raw_text[:500]}")
-                        continue
-                    if isinstance(parsed, list) and len(parsed) > 0:
-                        return parsed[0]
-                    elif isinstance(parsed, dict):
-                        return parsed
-                else:
-                    print(f"AI Response Missing Candidates: {result}")
-            elif response.status_code == 429:
-                print(f"AI Rate Limited (attempt {attempt + 1}/3), retrying...")
-                time.sleep(3)
-            else:
-                print(f"AI Request Failed: {response.status_code} - {response.text[:500]}")
-        except Exception as e:
-            print(f"AI Exception: {e}")
-    return None
-
-def search_google_places(lat: float, lng: float, radius_km: float, max_count=20):
-    url = "https://places.googleapis.com/v1/places:searchNearby"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": MAPS_KEY,
-        "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress,places.location,places.rating,places.priceLevel,places.reviews"
-    }
-    body = {
-        "includedTypes": ["cafe", "coffee_shop"],
-        "maxResultCount": max_count,
-        "locationRestriction": {
-            "circle": {
-                "center": {"latitude": lat, "longitude": lng},
-                "radius": radius_km * 1000.0
-            }
-        }
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=body, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            # Sort places by distance to center
-            places = data.get('places', [])
-            return places
-    except Exception as e:
-        print(f"❌ Google Places API Error: {e}")
-    return []
-
-
 # --- The Schema ---
 class Vibe(BaseModel):
     summary: Optional[str]
@@ -186,212 +122,379 @@ class CityRequest(BaseModel):
     city: str
     email: Optional[str] = None
 
+class PrefetchPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+
+class PrefetchRequest(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    # Bounded: warmed entries hold limit * 3 rows each in worker memory (40km = the UI's max distance)
+    radius_km: float = Field(5.0, gt=0, le=40)
+    limit: int = Field(50, ge=1, le=100)
+    heading: Optional[float] = None   # Degrees, 0 = north; narrows prefetch to cells ahead
+    # Explicit candidate search points instead (capped: only PREFETCH_MAX_CELLS are ever warmed)
+    points: Optional[List[PrefetchPoint]] = Field(None, max_length=PREFETCH_MAX_CELLS)
+
+
+def row_to_cafe(row, distance_km):
+    vibes = None
+    if row.get('summary'):
+        vibes = {k: row.get(k) for k in VIBE_FIELDS}
+    return {
+        **{k: row[k] for k in ["id", "name", "address", "rating", "price_level", "lat", "lng"]},
+        "distance_km": round(distance_km, 2),
+        "vibes": vibes
+    }
 
-# Database Connection
-def get_db_connection():
+
+def load_semantic_rows(after_id):
+    with get_read_cursor() as conn:
+        with conn.cursor() as setup:
+            # Full-table read for the first build, exempt from the per-request statement timeout
+            setup.execute("SET LOCAL statement_timeout = 0;")
+        # Server-side cursor: rows stream to the embedder instead of one giant fetchall()
+        with conn.cursor(name="semantic_rows", cursor_factory=RealDictCursor) as cursor:
+            cursor.itersize = 5000
+            cursor.execute("""
+                SELECT p.id, ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
+                    v.summary, v.seating_tip, v.vibe_tags, v.best_for, v.noise_level, v.wifi_quality,
+                    v.outlets_level, v.comfort_level, v.food_type, v.group_suitability, v.is_late_night
+                FROM places p
+                JOIN place_vibes v ON p.id = v.place_id
+                WHERE v.summary IS NOT NULL AND p.id > %s
+                ORDER BY p.id;
+            """, (after_id,))
+            yield from cursor
+
+snapshot_reader = SnapshotReader()
+semantic_search = SemanticSearch(load_semantic_rows, snapshot_reader)
+
+
+def track_demand(conn, record_fn, *args):
+    """Runs a demand/spend bookkeeping insert in its own transaction; never breaks the stream."""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
+        with conn.cursor() as cursor:
+            record_fn(cursor, *args)
+        conn.commit()
     except Exception as e:
-        print(f"❌ DB Connect Error: {e}")
-        raise HTTPException(500, f"Database Connect Error: {e}")
+        print(f"Demand Tracking Error: {e}")
+        conn.rollback()
+
+
+def save_live_place(conn, cursor, place, vibe_data):
+    new_place_id = save_place(cursor, place, vibe_data)
+    conn.commit()
+    invalidate_around(place['location']['latitude'], place['location']['longitude'])
+    return new_place_id
+
 
-@contextmanager
-def get_db_cursor():
-    conn = get_db_connection()
+def read_nearby(active, snapshot, search_lat, search_lng, radius_km, limit, open_at=None):
+    # Served from the mmap snapshot when one is given: no DB round-trip at all
+    if snapshot is not None:
+        metrics.incr("snapshot_reads")
+        return snapshot.nearby(search_lat, search_lng, radius_km, limit, open_at)
+
+    # Reads go to a replica when one is healthy; writes stay on the stream's primary connection
+    with get_read_cursor() as read_conn, active.running(read_conn):
+        with read_conn.cursor(cursor_factory=RealDictCursor) as read_cursor:
+            return nearby_rows(read_cursor, search_lat, search_lng, radius_km, limit, open_at)
+
+
+def record_live_spend(places_calls, ai_calls):
+    # Own pooled connection: the stream's connection may be mid-cancel when this runs
     try:
-        yield conn
-    finally:
-        conn.close()
+        with get_db_cursor() as spend_conn:
+            track_demand(spend_conn, record_spend, "live", places_calls, ai_calls)
+    except Exception as e:
+        print(f"Spend Tracking Error: {e}")
+
 
+async def cafe_stream_generator(request: Request, search_lat: float, search_lng: float, radius_km: float, limit: int, open_at=None):
+    conn = None
+    cursor = None
+    places_calls = 0
+    ai_calls = 0
+    active = ActiveConnection()  # Pooled read connection currently running a query, if any
+
+    def cancel_db():
+        # Aborts the running statement server-side
+        active.cancel()
+        if conn is not None and not conn.closed:
+            conn.cancel()
+
+    async def db(fn, *args):
+        # Blocking psycopg2 work runs off the event loop and is cancelled on disconnect
+        return await guarded(request, asyncio.to_thread(fn, *args), "db_query", on_cancel=cancel_db)
 
-async def cafe_stream_generator(request: Request, search_lat: float, search_lng: float, radius_km: float, limit: int):
-    # 1. Yield Cached Initial cafes
-    cached_ids = set()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        query = """
-        SELECT 
-            p.id, p.google_place_id, p.name, p.address, p.rating, p.price_level,
-            ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
-            v.*, 
-            (ST_Distance(p.location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography) / 1000) as distance_km
-        FROM places p
-        LEFT JOIN place_vibes v ON p.id = v.place_id
-        WHERE ST_DWithin(p.location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s * 1000)
-        ORDER BY distance_km ASC LIMIT %s;
-        """
-        cursor.execute(query, (search_lng, search_lat, search_lng, search_lat, radius_km, limit))
-        rows = cursor.fetchall()
+        # 1. Yield Cached Initial cafes
+        cached_ids = set()
+        try:
+            snapshot = snapshot_reader.current()
+            rows = await db(read_nearby, active, snapshot, search_lat, search_lng, radius_km, limit)
+            if snapshot is not None and len(rows) < MIN_CACHED_RESULTS:
+                # Places mined since the export aren't in the snapshot: check the DB before mining again
+                metrics.incr("snapshot_fallbacks")
+                snapshot = None
+                rows = await db(read_nearby, active, None, search_lat, search_lng, radius_km, limit)
+            # Coverage (and what not to re-mine) is judged on all cached places, open or not
+            open_rows = rows if open_at is None else await db(
+                read_nearby, active, snapshot, search_lat, search_lng, radius_km, limit, open_at
+            )
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            if isinstance(e, QueryCanceled):
+                metrics.incr("statement_timeouts")
+            print(f"Stream DB Error: {e}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
         
         for row in rows:
             if row.get('google_place_id'):
                 cached_ids.add(row['google_place_id'])
-                
-            vibes = None
-            if row.get('summary'):
-                vibes = {
-                    k: row.get(k) for k in [
-                        "summary", "vibe_tags", "best_for",
-                        "noise_level", "wifi_quality", 
-                        "outlets_level", "comfort_level", "food_type", 
-                        "seating_tip", "busyness_info", "group_suitability", 
-                        "is_late_night", "time_limit_status", "bathroom_status", 
-                        "has_natural_light"
-                    ]
-                }
-            
-            cafe_obj = {
-                **{k: row[k] for k in ["id", "name", "address", "rating", "price_level", "lat", "lng"]},
-                "distance_km": round(row['distance_km'], 2),
-                "vibes": vibes
-            }
+
+        for row in open_rows:
+            cached_ids.add(row['google_place_id'])
+            cafe_obj = row_to_cafe(row, row['distance_km'])
             yield f"data: {json.dumps(cafe_obj)}\n\n"
-            
-    except Exception as e:
-        print(f"Stream DB Error: {e}")
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
-        conn.close()
-        return
-
-    # 2. Yield Dynamic Google/Gemini Cafes (only when cache is thin nearby)
-    if len(cached_ids) < MIN_CACHED_RESULTS:
-        print(f"📡 Only {len(cached_ids)} cached nearby (< {MIN_CACHED_RESULTS}), requesting Google Places Search...")
-        
-        google_places = search_google_places(search_lat, search_lng, radius_km, max_count=20)
-        
-        for place in google_places:
-            if await request.is_disconnected():
-                break
-
-            pid = place.get('id')
-            if pid in cached_ids:
-                continue # Already yielded from DB
-            
-            name = place.get('displayName', {}).get('text')
-            print(f"  -> Mining New Place Live: {name}")
-            
-            # Send to AI
-            vibe_data = get_vibe_from_ai(place.get('reviews', []))
-            
-            if vibe_data:
-                # Add to DB Cache
-                price_int = 1
-                if place.get('priceLevel') == "PRICE_LEVEL_MODERATE": price_int = 2
-                elif place.get('priceLevel') == "PRICE_LEVEL_EXPENSIVE": price_int = 3
-
-                try:
-                    cursor.execute("""
-                        INSERT INTO places (google_place_id, name, address, location, rating, price_level)
-                        VALUES (%s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s, %s)
-                        RETURNING id;
-                    """, (
-                        pid, name, place.get('formattedAddress'),
-                        place['location']['longitude'], place['location']['latitude'], 
-                        place.get('rating'), price_int
-                    ))
-                    res = cursor.fetchone()
-                    new_place_id = res['id'] if isinstance(res, dict) else res[0]
-
-                    cursor.execute("""
-                        INSERT INTO place_vibes 
-                        (place_id, vibe_tags, best_for, noise_level, wifi_quality, outlets_level, comfort_level, 
-                        food_type, seating_tip, busyness_info, group_suitability,
-                        summary, is_late_night, time_limit_status, bathroom_status, has_natural_light, price_perception)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-                    """, (
-                        new_place_id, 
-                        vibe_data.get('vibes', []), 
-                        vibe_data.get('best_for', []),
-                        vibe_data.get('noise_level'), 
-                        vibe_data.get('wifi'),
-                        vibe_data.get('outlets_level'),
-                        vibe_data.get('comfort_level'),
-                        vibe_data.get('food_type'),
-                        vibe_data.get('seating_tip'),
-                        None,
-                        vibe_data.get('group_suitability'),
-                        vibe_data.get('summary'),
-                        vibe_data.get('is_late_night'),
-                        None, # time_limit_status
-                        vibe_data.get('bathroom_status'),
-                        False,
-                        vibe_data.get('price_perception')
-                    ))
-                    conn.commit()
-                except Exception as e:
-                    print(f"Failed to save {name} to DB: {e}")
-                    conn.rollback()
-                    new_place_id = -1 # Fake ID for stream
-                
-                # Format exactly like DB
-                vibes = {
-                     "summary": vibe_data.get('summary'),
-                     "vibe_tags": vibe_data.get('vibes', []),
-                     "best_for": vibe_data.get('best_for', []),
-                     "noise_level": vibe_data.get('noise_level'),
-                     "wifi_quality": vibe_data.get('wifi'),
-                     "outlets_level": vibe_data.get('outlets_level'),
-                     "comfort_level": vibe_data.get('comfort_level'),
-                     "food_type": vibe_data.get('food_type'),
-                     "seating_tip": vibe_data.get('seating_tip'),
-                     "busyness_info": None,
-                     "group_suitability": vibe_data.get('group_suitability'),
-                     "is_late_night": vibe_data.get('is_late_night'),
-                     "time_limit_status": None,
-                     "bathroom_status": vibe_data.get('bathroom_status'),
-                     "has_natural_light": False
-                }
-                
-                # Calc rough distance from center
-                from math import radians, cos, sin, asin, sqrt
-                def haversine(lon1, lat1, lon2, lat2):
-                    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-                    dlon = lon2 - lon1 
-                    dlat = lat2 - lat1 
-                    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                    c = 2 * asin(sqrt(a)) 
-                    r = 6371 # km
-                    return c * r
-                
-                dist = haversine(search_lng, search_lat, place['location']['longitude'], place['location']['latitude'])
-                
-                stream_obj = {
-                    "id": new_place_id,
-                    "name": name,
-                    "address": place.get('formattedAddress'),
-                    "rating": place.get('rating'),
-                    "price_level": price_int,
-                    "lat": place['location']['latitude'],
-                    "lng": place['location']['longitude'],
-                    "distance_km": round(dist, 2),
-                    "vibes": vibes
-                }
-                
-                yield f"data: {json.dumps(stream_obj)}\n\n"
-                
-    cursor.close()
-    conn.close()
-    yield "event: done\ndata: {}\n\n"
+
+        # 2. Yield Dynamic Google/Gemini Cafes (only when cache is thin nearby)
+        if len(cached_ids) < MIN_CACHED_RESULTS and not draining.is_set():
+            print(f"📡 Only {len(cached_ids)} cached nearby (< {MIN_CACHED_RESULTS}), requesting Google Places Search...")
+            # Primary connection only for streams that mine (writes + advisory lock)
+            try:
+                conn = await db(get_db_connection)
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+            except ClientDisconnected:
+                raise
+            except Exception as e:
+                print(f"Stream DB Error: {e}")
+                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                return
+            await db(track_demand, conn, record_cache_miss, search_lat, search_lng, radius_km, len(cached_ids))
+
+            # One stream per area mines at a time, across all workers (lock dies with the connection)
+            flight_key = f"mine:{response_cell(search_lat, search_lng, radius_km)}"
+            holds_lock, waited = await singleflight.acquire(conn, flight_key, request)
+            if waited:
+                print(f"  -> Waited on another stream mining {flight_key}")
+
+            http = get_http_client()
+            places_calls += 1
+            google_places = await guarded(
+                request, search_places_nearby_async(http, search_lat, search_lng, radius_km, max_count=20), "places_call"
+            ) or []
+
+            # Places saved since the cached rows were read (e.g. by the stream we waited on)
+            # are served from the DB instead of being sent to the AI again
+            known_ids = set()
+            try:
+                fresh_rows = await db(
+                    rows_by_google_ids, cursor, search_lat, search_lng,
+                    [p.get('id') for p in google_places if p.get('id') and p.get('id') not in cached_ids]
+                )
+                for row in fresh_rows:
+                    known_ids.add(row['google_place_id'])
+                    if open_at is not None and not is_open_at(row['open_week'], row['utc_offset_minutes'], *open_at):
+                        continue
+                    yield f"data: {json.dumps(row_to_cafe(row, row['distance_km']))}\n\n"
+            except ClientDisconnected:
+                raise
+            except Exception as e:
+                print(f"Known Places Lookup Error: {e}")
+                conn.rollback()
+
+            for place in google_places:
+                if draining.is_set():
+                    break
+
+                pid = place.get('id')
+                if pid in cached_ids or pid in known_ids:
+                    continue # Already yielded from DB (or just mined by another request)
+
+                name = place.get('displayName', {}).get('text')
+                print(f"  -> Mining New Place Live: {name}")
+
+                # Send to AI
+                ai_calls += 1
+                vibe_data = await guarded(request, get_vibe_from_ai_async(http, place.get('reviews', [])), "ai_call")
+
+                if vibe_data:
+                    # Add to DB Cache
+                    try:
+                        new_place_id = await db(save_live_place, conn, cursor, place, vibe_data)
+                    except ClientDisconnected:
+                        raise
+                    except Exception as e:
+                        print(f"Failed to save {name} to DB: {e}")
+                        conn.rollback()
+                        new_place_id = -1 # Fake ID for stream
+
+                    # Mined and saved either way; only streamed if it matches the hours filter
+                    if open_at is not None and not is_open_at(
+                        week_bitmap(place.get('regularOpeningHours')), place.get('utcOffsetMinutes'), *open_at
+                    ):
+                        continue
+
+                    # Calc rough distance from center
+                    dist = haversine(search_lng, search_lat, place['location']['longitude'], place['location']['latitude'])
+
+                    stream_obj = {
+                        "id": new_place_id,
+                        "name": name,
+                        "address": place.get('formattedAddress'),
+                        "rating": place.get('rating'),
+                        "price_level": price_level_to_int(place.get('priceLevel')),
+                        "lat": place['location']['latitude'],
+                        "lng": place['location']['longitude'],
+                        "distance_km": round(dist, 2),
+                        "vibes": vibe_to_response(vibe_data)
+                    }
+
+                    yield f"data: {json.dumps(stream_obj)}\n\n"
+
+            if holds_lock:
+                await db(singleflight.release, conn, flight_key)
+
+        metrics.incr("streams_completed")
+        yield "event: done\ndata: {}\n\n"
+
+    except ClientDisconnected:
+        metrics.incr("streams_abandoned")
+        print(f"🔌 Client left, abandoned stream at ({search_lat:.4f}, {search_lng:.4f})")
+    except asyncio.CancelledError:
+        metrics.incr("streams_abandoned")
+        raise
+    finally:
+        # Runs on success, error, disconnect and server-side cancellation alike
+        if places_calls or ai_calls:
+            # Handed to the thread pool, not awaited: a finally can't await once the stream is
+            # being closed, and the insert shouldn't block the event loop either
+            asyncio.get_running_loop().run_in_executor(None, record_live_spend, places_calls, ai_calls)
+        if cursor is not None and not cursor.closed:
+            cursor.close()
+        if conn is not None and not conn.closed:
+            conn.close()
+
 
 @app.get("/cafes")
-async def get_nearby_cafes_stream(request: Request, address: Optional[str] = Query(None), lat: Optional[float] = Query(None), lng: Optional[float] = Query(None), radius_km: float = 5.0, limit: int = 50):
+async def get_nearby_cafes_stream(request: Request, address: Optional[str] = Query(None), lat: Optional[float] = Query(None), lng: Optional[float] = Query(None), radius_km: float = Query(5.0, gt=0, le=40), limit: int = Query(50, ge=1, le=100), open_at: Optional[str] = Query(None, description='"now" or ISO datetime; naive times are local to each cafe')):
     search_lat, search_lng = lat, lng
     if address:
-        coords = get_coordinates_from_address(address)
+        coords = await asyncio.to_thread(get_coordinates_from_address, address)
         if coords: search_lat, search_lng = coords
     
     if search_lat is None: 
         raise HTTPException(400, "Need location")
 
+    open_at_params = None
+    if open_at:
+        try:
+            open_at_params = parse_open_at(open_at)
+        except ValueError:
+            raise HTTPException(400, "open_at must be 'now' or an ISO datetime")
+
     return StreamingResponse(
-        cafe_stream_generator(request, search_lat, search_lng, radius_km, limit), 
+        track_stream(cafe_stream_generator(request, search_lat, search_lng, radius_km, limit, open_at_params)), 
         media_type="text/event-stream"
     )
 
 
+def warm_prefetch_cells(cells, radius_km, limit):
+    """Background task: warm response + coverage caches and queue thin cells for mining."""
+    try:
+        # Proximity and coverage reads go to a replica when there is one
+        coverage = {}
+        with get_read_cursor() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                for cell in cells:
+                    lat, lng = geohash_center(cell)
+                    # A per-process response cache (replica mode) would only be warm in this worker
+                    if not RESPONSE_CACHE_PER_PROCESS and not is_warm(lat, lng, radius_km, limit):
+                        warm_around(cursor, lat, lng, radius_km, limit)
+                    coverage[cell] = cell_coverage(cursor, geohash_encode(lat, lng, COVERAGE_CELL_PRECISION))
+
+        thin = [c for c in cells if coverage[c] < MIN_CACHED_RESULTS]
+        if not thin:
+            return
+        with get_db_cursor() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                queued_today = count_cache_misses_today(cursor, "prefetch")
+                for cell in thin:
+                    if queued_today >= PREFETCH_DAILY_QUEUE_CAP:
+                        break
+                    # Low-weight demand event; the scheduler decides if/when it is worth mining
+                    lat, lng = geohash_center(cell)
+                    record_cache_miss(cursor, lat, lng, radius_km, coverage[cell], source="prefetch")
+                    queued_today += 1
+                conn.commit()
+    except Exception as e:
+        print(f"Prefetch Error: {e}")
+
+
+@app.post("/cafes/prefetch")
+def prefetch_cafes(req: PrefetchRequest, background_tasks: BackgroundTasks):
+    if req.points:
+        cells = [response_cell(p.lat, p.lng, req.radius_km) for p in req.points]
+    else:
+        view_cell = response_cell(req.lat, req.lng, req.radius_km)
+        cells = geohash_cells_ahead(view_cell, req.heading) if req.heading is not None else geohash_neighbors(view_cell)
+
+    # Dedupe while keeping priority order, then apply the per-request and global budgets
+    cells = list(dict.fromkeys(cells))[:PREFETCH_MAX_CELLS]
+    cells = [c for c in cells if not is_warm(*geohash_center(c), req.radius_km, req.limit)]
+    accepted = [c for c in cells if prefetch_budget.take()]
+
+    if accepted:
+        background_tasks.add_task(warm_prefetch_cells, accepted, req.radius_km, req.limit)
+    return {"accepted": accepted, "dropped": len(cells) - len(accepted)}
+
+
+@app.get("/cafes/search")
+def search_cafes_semantic(q: str = Query(..., min_length=2), address: Optional[str] = Query(None), lat: Optional[float] = Query(None), lng: Optional[float] = Query(None), radius_km: float = Query(5.0, gt=0, le=40), limit: int = Query(20, ge=1, le=100), distance_weight: float = Query(0.3, ge=0, le=1)):
+    search_lat, search_lng = lat, lng
+    if address:
+        coords = get_coordinates_from_address(address)
+        if coords: search_lat, search_lng = coords
+
+    if search_lat is None:
+        raise HTTPException(400, "Need location")
+
+    matches = semantic_search.search(q, search_lat, search_lng, radius_km, limit, distance_weight)
+    if matches is None:
+        raise HTTPException(503, "Semantic index is still building, try again shortly")
+    if not matches:
+        return []
+
+    # Hydrate the ranked ids with a primary-key lookup
+    try:
+        with get_read_cursor() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                # Explicit vibe columns: v.* would shadow p.id with place_vibes.id
+                cursor.execute(f"""
+                    SELECT p.id, p.name, p.address, p.rating, p.price_level,
+                        ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
+                        {", ".join("v." + f for f in VIBE_FIELDS)}
+                    FROM places p
+                    LEFT JOIN place_vibes v ON p.id = v.place_id
+                    WHERE p.id = ANY(%s);
+                """, ([m[0] for m in matches],))
+                rows = {row['id']: row for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Semantic Search Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = []
+    for place_id, score, similarity, distance_km in matches:
+        row = rows.get(place_id)
+        if not row:
+            continue  # Deleted since the index was built
+        results.append({**row_to_cafe(row, distance_km), "score": round(score, 4), "similarity": round(similarity, 4)})
+    return results
+
+
 @app.post("/requests")
 def submit_request(req: CityRequest):
     try:
@@ -406,3 +509,14 @@ def submit_request(req: CityRequest):
     except Exception as e:
         print(f"Request Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/mining/queue")
+def mining_queue_dashboard():
+    try:
+        with get_db_cursor() as conn:
+            with conn.cursor() as cursor:
+                return queue_status(cursor)
+    except Exception as e:
+        print(f"Mining Queue Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
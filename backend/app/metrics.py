@@ -0,0 +1,14 @@
+import threading
+from collections import defaultdict
+
+# Per-process counters; each gunicorn worker reports its own (see /metrics)
+_counters = defaultdict(int)
+_lock = threading.Lock()
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+def snapshot():
+    with _lock:
+        return dict(_counters)
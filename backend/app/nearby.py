@@ -0,0 +1,190 @@
+"""
+Cached proximity reads for /cafes.
+
+Results are cached per geohash cell (sized to the search radius, e.g. geohash-5 for
+the default 5km) rather than per exact point, so nearby searches and prefetches of
+neighbouring cells share entries. Each entry is fetched around the cell center with
+the radius padded by the cell's half-diagonal, then re-ranked from the caller's real
+position. An entry records how far out it is complete; if the rows a request needs
+(its limit-th nearest, or its whole radius) reach past that, the next finer cell is
+tried (dense areas end up cached on smaller cells), and past geohash-7 the DB.
+"""
+import os
+
+from app.cache import make_cache
+from app.db import execute_prepared, DATABASE_REPLICA_URLS
+from app.hours import OPEN_AT_SQL
+from app.geo import haversine, geohash_encode, geohash_bbox, geohash_center, geohash_neighbors, geohash_precision_for_radius
+
+COVERAGE_CELL_PRECISION = 5
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "120"))
+COVERAGE_CACHE_TTL = int(os.getenv("COVERAGE_CACHE_TTL", "300"))
+FETCH_LIMIT_FACTOR = 3  # Over-fetch so re-ranking from an off-center point stays exact
+MAX_RESPONSE_PRECISION = 7  # Finest cell a dense area's entries fall back to before going to the DB
+
+VIBE_FIELDS = [
+    "summary", "vibe_tags", "best_for",
+    "noise_level", "wifi_quality",
+    "outlets_level", "comfort_level", "food_type",
+    "seating_tip", "busyness_info", "group_suitability",
+    "is_late_night", "time_limit_status", "bathroom_status",
+    "has_natural_light"
+]
+
+def _nearby_query(extra_where=""):
+    # Explicit vibe columns: v.* would shadow p.id with place_vibes.id
+    return f"""
+    SELECT
+        p.id, p.google_place_id, p.name, p.address, p.rating, p.price_level,
+        ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
+        {", ".join("v." + f for f in VIBE_FIELDS)},
+        (ST_Distance(p.location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography) / 1000) as distance_km
+    FROM places p
+    LEFT JOIN place_vibes v ON p.id = v.place_id
+    WHERE ST_DWithin(p.location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s * 1000)
+    {extra_where}
+    ORDER BY distance_km ASC LIMIT %s;
+    """
+
+NEARBY_QUERY = _nearby_query()
+NEARBY_OPEN_QUERY = _nearby_query(f"AND {OPEN_AT_SQL}")
+NEARBY_TYPES = ["float8", "float8", "float8", "float8", "float8", "int"]
+NEARBY_OPEN_TYPES = ["float8", "float8", "float8", "float8", "float8", "int", "bool", "int"]
+
+# With replicas, a shared response cache would put a primary read (and write) back on every
+# replica-routed request, and UNLOGGED tables can't be read on a standby. It stays
+# per-process instead; other workers' entries then expire by TTL rather than invalidation.
+RESPONSE_CACHE_PER_PROCESS = bool(DATABASE_REPLICA_URLS)
+response_cache = make_cache("response", RESPONSE_CACHE_TTL, shared=not RESPONSE_CACHE_PER_PROCESS)
+coverage_cache = make_cache("coverage", COVERAGE_CACHE_TTL)
+
+def query_nearby(cursor, lat, lng, radius_km, limit, open_at=None):
+    """open_at: (minute_of_week, use_offset) from hours.parse_open_at, or None for no filter."""
+    if open_at is None:
+        execute_prepared(cursor, "nearby_cafes", NEARBY_QUERY, (lng, lat, lng, lat, radius_km, limit), NEARBY_TYPES)
+    else:
+        execute_prepared(cursor, "nearby_open_cafes", NEARBY_OPEN_QUERY,
+                         (lng, lat, lng, lat, radius_km, *open_at, limit), NEARBY_OPEN_TYPES)
+    return [dict(row) for row in cursor.fetchall()]
+
+def _cell_pad_km(cell):
+    south, west, north, east = geohash_bbox(cell)
+    return haversine(west, south, east, north) / 2
+
+def _response_key(cell, radius_km, limit):
+    return f"{cell}:{radius_km}:{limit}"
+
+def response_cell(lat, lng, radius_km):
+    return geohash_encode(lat, lng, geohash_precision_for_radius(radius_km))
+
+def _response_cells(lat, lng, radius_km):
+    """The point's response cell, then finer ones: a smaller cell pads less, for areas too dense for the first."""
+    for precision in range(geohash_precision_for_radius(radius_km), MAX_RESPONSE_PRECISION + 1):
+        yield geohash_encode(lat, lng, precision)
+
+def warm_cell(cursor, cell, radius_km, limit):
+    """Fetches and caches the cafes around a response cell. Returns the cache entry."""
+    c_lat, c_lng = geohash_center(cell)
+    fetch_radius = radius_km + _cell_pad_km(cell)
+    fetch_limit = limit * FETCH_LIMIT_FACTOR
+    rows = query_nearby(cursor, c_lat, c_lng, fetch_radius, fetch_limit)
+
+    # A full page means rows beyond the last one may exist: only trust up to its distance
+    complete_within_km = rows[-1]['distance_km'] if len(rows) >= fetch_limit else fetch_radius
+    entry = {"rows": rows, "complete_within_km": complete_within_km}
+    response_cache.set(_response_key(cell, radius_km, limit), entry)
+    return entry
+
+def _rows_from_entry(entry, cell, lat, lng, radius_km, limit):
+    """The exact answer for (lat, lng) out of a cell's entry, or None if the entry can't give it."""
+    rows = []
+    for row in entry["rows"]:
+        dist = haversine(lng, lat, row['lng'], row['lat'])
+        if dist <= radius_km:
+            rows.append({**row, "distance_km": dist})
+    rows.sort(key=lambda r: r['distance_km'])
+
+    # A place missing from the entry is more than complete_within_km from the center, so at
+    # least that minus offset_km from the caller. The answer is exact if everything it
+    # needs is closer than that: the limit-th row when the page is full, else the radius.
+    c_lat, c_lng = geohash_center(cell)
+    offset_km = haversine(lng, lat, c_lng, c_lat)
+    needed_km = rows[limit - 1]['distance_km'] if len(rows) >= limit else radius_km
+    if needed_km + offset_km > entry["complete_within_km"]:
+        return None
+    return rows[:limit]
+
+def _cached_rows(cursor, lat, lng, radius_km, limit, warm=True):
+    """Rows from the first response cell whose entry is exact for (lat, lng), warming missing ones."""
+    for cell in _response_cells(lat, lng, radius_km):
+        entry = response_cache.get(_response_key(cell, radius_km, limit))
+        if entry is None:
+            if not warm:
+                return None
+            entry = warm_cell(cursor, cell, radius_km, limit)
+        rows = _rows_from_entry(entry, cell, lat, lng, radius_km, limit)
+        if rows is not None:
+            return rows
+    return None
+
+def is_warm(lat, lng, radius_km, limit):
+    """True if a read at (lat, lng) would be answered from cache."""
+    return _cached_rows(None, lat, lng, radius_km, limit, warm=False) is not None
+
+def warm_around(cursor, lat, lng, radius_km, limit):
+    """Warms the response cells a read at (lat, lng) needs (e.g. a prefetched cell's center)."""
+    _cached_rows(cursor, lat, lng, radius_km, limit)
+
+def nearby_rows(cursor, lat, lng, radius_km, limit, open_at=None):
+    """Cafes within radius_km of (lat, lng), nearest first, served from cache when exact."""
+    if open_at is not None:
+        # The hours check runs inside the spatial query; per-minute results aren't worth caching
+        return query_nearby(cursor, lat, lng, radius_km, limit, open_at)
+
+    rows = _cached_rows(cursor, lat, lng, radius_km, limit)
+    if rows is None:
+        rows = query_nearby(cursor, lat, lng, radius_km, limit)
+    return rows
+
+def cell_coverage(cursor, cell):
+    """Number of cached places inside a coverage cell (geohash-5)."""
+    count = coverage_cache.get(cell)
+    if count is None:
+        south, west, north, east = geohash_bbox(cell)
+        cursor.execute(
+            "SELECT COUNT(*) FROM places WHERE location && ST_MakeEnvelope(%s, %s, %s, %s, 4326);",
+            (west, south, east, north)
+        )
+        row = cursor.fetchone()
+        count = row['count'] if isinstance(row, dict) else row[0]
+        coverage_cache.set(cell, count)
+    return count
+
+def invalidate_around(lat, lng):
+    """Drops cached entries that could contain a newly inserted place at (lat, lng)."""
+    cell5 = geohash_encode(lat, lng, COVERAGE_CELL_PRECISION)
+    area = [cell5] + geohash_neighbors(cell5)
+    # Response keys start with their cell; finer cells share the geohash-5 prefix
+    response_cache.invalidate_prefixes(area)
+    coverage_cache.invalidate_prefixes([cell5])
+
+def rows_by_google_ids(cursor, lat, lng, google_place_ids):
+    """
+    Same shape as nearby_rows, for specific places (e.g. ones another worker just mined),
+    plus open_week/utc_offset_minutes so callers can apply an open_at filter themselves.
+    """
+    if not google_place_ids:
+        return []
+    cursor.execute(f"""
+        SELECT
+            p.id, p.google_place_id, p.name, p.address, p.rating, p.price_level,
+            ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
+            {", ".join("v." + f for f in VIBE_FIELDS)},
+            p.open_week, p.utc_offset_minutes,
+            (ST_Distance(p.location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography) / 1000) as distance_km
+        FROM places p
+        LEFT JOIN place_vibes v ON p.id = v.place_id
+        WHERE p.google_place_id = ANY(%s)
+        ORDER BY distance_km ASC;
+    """, (lng, lat, list(google_place_ids)))
+    return [dict(row) for row in cursor.fetchall()]
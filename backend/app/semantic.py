@@ -0,0 +1,301 @@
+"""
+Hybrid semantic search over vibe summaries.
+
+Text is embedded with hashed word + character n-gram features (no model download,
+no external service), so "quiet spot w/ big tables for coding late" still matches a
+summary that says "calm, large desks, open until midnight, lots of laptops".
+
+With a cafe snapshot (app/snapshot.py) the vectors are embedded once at export and
+read from the shared mmap, so every worker searches the same page-cache copy; only
+places mined since the export are embedded in-process. Without one, each worker builds
+its own index at startup.
+
+The in-process index is plain numpy arrays:
+  - rows sorted by a coarse lat/lng grid key, so a radius query only touches the
+    handful of contiguous slices that cover the search circle
+  - float16 vectors (DIM * 2 bytes per place, ~256MB at 1M places)
+Within the geo-filtered candidates the cosine search is exact, which at city-scale
+candidate counts is faster than maintaining a separate ANN graph.
+"""
+import re
+import threading
+import time
+import zlib
+from math import floor
+
+import numpy as np
+
+from app.geo import circle_bbox
+
+DIM = 128
+GRID_DEG = 0.05           # ~5.5km grid cells for the geo prefilter
+GRID_COLS = int(360 / GRID_DEG)
+INDEX_TTL_SECONDS = 120   # Refresh in the background after this long so newly mined places show up
+REFRESH_ID_OVERLAP = 1000 # Re-read recent ids too: a lower id can commit after a higher one
+INITIAL_BUILD_WAIT_SECONDS = 20
+BUILD_CHUNK = 10000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = {
+    "a", "an", "the", "and", "or", "for", "to", "of", "in", "on", "at", "with", "w",
+    "is", "it", "its", "place", "spot", "cafe", "coffee", "shop", "good", "great",
+}
+
+# Enum values are short; expand them into words a user would actually type
+_ENUM_HINTS = {
+    "noise_level": {"Quiet": "quiet calm silent peaceful", "Moderate": "moderate background chatter", "Loud": "loud noisy busy lively"},
+    "wifi_quality": {"Fast": "fast wifi internet", "Spotty": "spotty wifi", "None": "no wifi"},
+    "outlets_level": {"Many": "outlets plugs power charging laptop", "Scarce": "few outlets", "None": "no outlets"},
+    "comfort_level": {"Cozy": "cozy comfy couches", "Spacious": "spacious big tables large room", "Hard Seats": "hard seats"},
+    "food_type": {"Full Meals": "food meals lunch dinner", "Pastries": "pastries bakery snacks", "Coffee Only": "coffee drinks"},
+    "group_suitability": {"Good for Groups": "groups group work friends", "Best for Pairs": "pairs date two", "Solo Only": "solo alone"},
+}
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOP_WORDS]
+
+def _features(tokens):
+    for i, tok in enumerate(tokens):
+        yield tok, 1.0
+        if i + 1 < len(tokens):
+            yield tok + " " + tokens[i + 1], 0.7
+        # Character trigrams make "laptops"/"laptop" and "coding"/"code" overlap
+        padded = f"#{tok}#"
+        for j in range(len(padded) - 2):
+            yield padded[j:j + 3], 0.3
+
+def embed(text):
+    """Hashed n-gram embedding, L2-normalized float32 vector of length DIM."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for feat, weight in _features(tokenize(text)):
+        h = zlib.crc32(feat.encode())
+        # Signed hashing keeps collisions from only ever adding up
+        vec[h % DIM] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+def place_document(row):
+    """Text that represents a place: summary, seating tip, tags and expanded enums."""
+    parts = [row.get('summary') or "", row.get('seating_tip') or ""]
+    parts += row.get('vibe_tags') or []
+    parts += row.get('best_for') or []
+    for field, hints in _ENUM_HINTS.items():
+        parts.append(hints.get(row.get(field), ""))
+    if row.get('is_late_night'):
+        parts.append("late night open late evening")
+    return " ".join(p for p in parts if p)
+
+def _rank(ids, vectors, dist, query_vec, radius_km, limit, distance_weight):
+    """
+    [(place_id, score, similarity, distance_km)] for the best `limit` candidates.
+    score = (1 - distance_weight) * similarity + distance_weight * (1 - distance / radius)
+    """
+    if len(ids) == 0:
+        return []
+    sims = np.asarray(vectors).astype(np.float32) @ query_vec
+    sims = np.clip(sims, 0, 1)
+    scores = (1 - distance_weight) * sims + distance_weight * (1 - dist / radius_km)
+
+    k = min(limit, len(ids))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i]), float(sims[i]), float(dist[i])) for i in top]
+
+def search_snapshot(snapshot, query_vec, lat, lng, radius_km, limit=20, distance_weight=0.3):
+    """Same as VectorIndex.search, over the vectors stored in a CafeSnapshot."""
+    idx, dist = snapshot.within(lat, lng, radius_km)
+    # Places without a summary have zero vectors and aren't in the in-process index either
+    keep = snapshot.has_text("summary", idx)
+    idx, dist = idx[keep], dist[keep]
+    return _rank(snapshot.arrays['id'][idx], snapshot.vectors[idx], dist, query_vec, radius_km, limit, distance_weight)
+
+def _grid_key(lat, lng):
+    row = np.floor((np.asarray(lat) + 90) / GRID_DEG).astype(np.int64)
+    # lng 180 is lng -180: without the wrap it would land in column 0 of the next row
+    col = np.floor((np.asarray(lng) + 180) / GRID_DEG).astype(np.int64) % GRID_COLS
+    return row * GRID_COLS + col
+
+class VectorIndex:
+    def __init__(self, ids, lats, lngs, vectors):
+        order = np.argsort(_grid_key(lats, lngs), kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lats = np.asarray(lats, dtype=np.float64)[order]
+        self.lngs = np.asarray(lngs, dtype=np.float64)[order]
+        self.vectors = np.asarray(vectors, dtype=np.float16).reshape(-1, DIM)[order]
+        self.keys = _grid_key(self.lats, self.lngs)
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def max_id(self):
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    def extend(self, other):
+        """New index with other's places added (ids already present are skipped)."""
+        fresh = ~np.isin(other.ids, self.ids)
+        if not fresh.any():
+            return None
+        return VectorIndex(
+            np.concatenate([self.ids, other.ids[fresh]]),
+            np.concatenate([self.lats, other.lats[fresh]]),
+            np.concatenate([self.lngs, other.lngs[fresh]]),
+            np.concatenate([self.vectors, other.vectors[fresh]]),
+        )
+
+    def _candidates(self, lat, lng, radius_km):
+        """Row indices of every place in grid cells overlapping the search circle."""
+        south, north, lng_ranges = circle_bbox(lat, lng, radius_km)
+        row_lo = floor((south + 90) / GRID_DEG)
+        row_hi = floor((north + 90) / GRID_DEG)
+        # Split at the antimeridian, so a column index never runs into the neighbouring grid row
+        col_ranges = [(floor((west + 180) / GRID_DEG), min(floor((east + 180) / GRID_DEG), GRID_COLS - 1))
+                      for west, east in lng_ranges]
+
+        slices = []
+        for row in range(row_lo, row_hi + 1):
+            for col_lo, col_hi in col_ranges:
+                # Cells in one grid row are contiguous in key order
+                lo = np.searchsorted(self.keys, row * GRID_COLS + col_lo, side="left")
+                hi = np.searchsorted(self.keys, row * GRID_COLS + col_hi, side="right")
+                if hi > lo:
+                    slices.append(np.arange(lo, hi))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        # Both halves of a wrapped range can include the grid column at +/-180
+        return np.unique(np.concatenate(slices))
+
+    def search(self, query_vec, lat, lng, radius_km, limit=20, distance_weight=0.3):
+        """
+        Returns [(place_id, score, similarity, distance_km)] for the best matches within radius_km.
+        score = (1 - distance_weight) * similarity + distance_weight * (1 - distance / radius)
+        """
+        idx = self._candidates(lat, lng, radius_km)
+        if idx.size == 0:
+            return []
+
+        # Vectorized haversine over the candidates
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2, lng2 = np.radians(self.lats[idx]), np.radians(self.lngs[idx])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        dist = 2 * 6371 * np.arcsin(np.sqrt(a))
+
+        in_radius = dist <= radius_km
+        idx, dist = idx[in_radius], dist[in_radius]
+        return _rank(self.ids[idx], self.vectors[idx], dist, query_vec, radius_km, limit, distance_weight)
+
+def build_index(rows):
+    """rows: iterable of dicts with id, lat, lng and the place_vibes text columns (streamed, not held)."""
+    ids, lats, lngs = [], [], []
+    chunks, chunk = [], []
+    for r in rows:
+        ids.append(r['id'])
+        lats.append(r['lat'])
+        lngs.append(r['lng'])
+        chunk.append(embed(place_document(r)))
+        if len(chunk) >= BUILD_CHUNK:
+            chunks.append(np.stack(chunk).astype(np.float16))
+            chunk = []
+    if chunk:
+        chunks.append(np.stack(chunk).astype(np.float16))
+    vectors = np.concatenate(chunks) if chunks else np.zeros((0, DIM), dtype=np.float16)
+    return VectorIndex(ids, lats, lngs, vectors)
+
+class SemanticSearch:
+    """
+    Holds the in-process index: every place without a snapshot, or only the places after
+    the snapshot's max_id with one. The first build is a full load from that floor; after
+    that, refreshes only embed places newer than the index (ids are append-only; deleted
+    places are dropped at hydrate time), so a refresh costs what was mined since the last one.
+    """
+
+    def __init__(self, load_rows, snapshot_reader=None, ttl_seconds=INDEX_TTL_SECONDS):
+        self.load_rows = load_rows   # Callable(after_id) yielding rows with id > after_id
+        self.snapshot_reader = snapshot_reader
+        self.ttl_seconds = ttl_seconds
+        self.index = None
+        self.floor_id = None         # Id the index was built after (the snapshot's max_id, or 0)
+        self.lock = threading.Lock()
+        self.rebuilding = False
+        self.ready = threading.Event()
+
+    def _snapshot(self):
+        snapshot = self.snapshot_reader.current() if self.snapshot_reader else None
+        return snapshot if snapshot is not None and snapshot.vectors is not None else None
+
+    def _floor(self):
+        snapshot = self._snapshot()
+        return snapshot.max_id if snapshot is not None else 0
+
+    def _rebuild(self):
+        try:
+            current = self.index
+            floor = self._floor()
+            if current is None or floor != self.floor_id:
+                # First build, or a new snapshot took over everything up to its max_id.
+                # The overlap re-reads late commits below it; search() drops the duplicates.
+                self.index = build_index(self.load_rows(max(0, floor - REFRESH_ID_OVERLAP) if floor else 0))
+                self.floor_id = floor
+                print(f"🧭 Semantic index built: {len(self.index)} places after id {floor}")
+            else:
+                added = build_index(self.load_rows(max(0, current.max_id - REFRESH_ID_OVERLAP)))
+                extended = current.extend(added)
+                if extended is None:
+                    current.built_at = time.time()
+                else:
+                    self.index = extended  # Reference swap; in-flight searches keep the old arrays
+                    print(f"🧭 Semantic index refreshed: +{len(extended) - len(current)} places")
+        except Exception as e:
+            print(f"Semantic Index Error: {e}")
+        finally:
+            with self.lock:
+                self.rebuilding = False
+            self.ready.set()
+
+    def _start_rebuild(self):
+        # Single-flight: concurrent callers never start a second build
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+            if self.index is None:
+                self.ready.clear()
+        threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def start(self):
+        """Starts the first build in the background (worker startup), so searches don't wait on it."""
+        if self.index is None:
+            self._start_rebuild()
+
+    def get_index(self, wait_seconds=INITIAL_BUILD_WAIT_SECONDS):
+        """Current index, or None while the first build is still running after wait_seconds."""
+        index = self.index
+        if index is None:
+            self._start_rebuild()
+            self.ready.wait(wait_seconds)
+            return self.index
+        if self.floor_id != self._floor() or time.time() - index.built_at > self.ttl_seconds:
+            self._start_rebuild()
+        return index
+
+    def search(self, query, lat, lng, radius_km, limit=20, distance_weight=0.3):
+        """Returns None while the index is still being built for the first time (and there's no snapshot)."""
+        snapshot = self._snapshot()
+        # With a snapshot the in-process index only adds recent places: never wait for it
+        index = self.get_index(wait_seconds=0 if snapshot is not None else INITIAL_BUILD_WAIT_SECONDS)
+        if snapshot is None and index is None:
+            return None
+
+        query_vec = embed(query)
+        matches = []
+        if snapshot is not None:
+            matches += search_snapshot(snapshot, query_vec, lat, lng, radius_km, limit, distance_weight)
+        if index is not None:
+            matches += index.search(query_vec, lat, lng, radius_km, limit, distance_weight)
+
+        best = {}
+        for match in matches:
+            if match[0] not in best or match[1] > best[match[0]][1]:
+                best[match[0]] = match
+        return sorted(best.values(), key=lambda m: -m[1])[:limit]
@@ -0,0 +1,43 @@
+"""
+Cross-worker single-flight for live mining, via Postgres session advisory locks.
+
+Two users searching the same area at the same time (on any worker) should not both
+pay for Places + Gemini on the same cafes. The first stream takes the lock for the
+area's cell and mines; others wait for it, then read what it saved from the DB.
+"""
+import asyncio
+import time
+
+SINGLE_FLIGHT_WAIT_SECONDS = 30
+POLL_SECONDS = 0.5
+
+def _try_lock(conn, key):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (key,))
+        got = cursor.fetchone()[0]
+    conn.commit()  # Session-level lock survives the commit
+    return got
+
+async def acquire(conn, key, request, wait_seconds=SINGLE_FLIGHT_WAIT_SECONDS):
+    """
+    Returns (held, waited). held is False if the client left or the leader took too long;
+    the caller may still proceed, it just won't hold the lock.
+    """
+    deadline = time.monotonic() + wait_seconds
+    waited = False
+    while True:
+        if await asyncio.to_thread(_try_lock, conn, key):
+            return True, waited
+        if time.monotonic() > deadline or await request.is_disconnected():
+            return False, waited
+        waited = True
+        await asyncio.sleep(POLL_SECONDS)
+
+def release(conn, key):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (key,))
+        conn.commit()
+    except Exception as e:
+        # Closing the connection releases it anyway
+        print(f"Single-flight Unlock Error: {e}")
@@ -0,0 +1,329 @@
+"""
+Memory-mapped cafe snapshot for DB-free reads.
+
+scripts/export_snapshot.py dumps places + place_vibes into one file; every worker
+mmaps it read-only, so all processes share a single page-cache copy and a /cafes
+cache read needs no Postgres round-trip.
+
+File layout (little-endian):
+  magic "VRSNAP01" | uint64 header length | JSON header | sections, 64-byte aligned
+
+The header lists every section (offset, dtype, shape), the enum vocabularies,
+built_at and max_id. Sections are column arrays in Z-order (Morton code of the quantized
+lat/lng), so places close on the map are close in the file:
+  - keys (uint64 Morton codes, sorted), lat/lng (float32), ids
+  - rating (float32, NaN = null), price_level (int8, -1 = null)
+  - enum columns as uint8/uint16 codes (0 = null), booleans as int8 (-1 = null)
+  - open_week bitmaps (see app/hours.py) and utc_offset_minutes
+  - strings as a uint64 offsets table per column into one packed UTF-8 blob
+  - semantic vectors (float16, see app/semantic.py; zeros for places without a summary),
+    embedded once at export so workers share them instead of each building an index
+"""
+import os
+import json
+import mmap
+import time
+import threading
+
+import numpy as np
+
+from app.geo import EARTH_RADIUS_KM, circle_bbox
+from app.hours import WEEK_SLOTS, WEEK_MINUTES, SLOT_MINUTES
+from app.semantic import DIM, embed, place_document
+
+MAGIC = b"VRSNAP01"
+ALIGN = 64
+LIST_SEP = "\x1f"
+NULL_OFFSET = np.iinfo(np.int16).min
+
+STRING_FIELDS = ["google_place_id", "name", "address", "summary", "seating_tip", "busyness_info"]
+LIST_FIELDS = ["vibe_tags", "best_for"]
+ENUM_FIELDS = [
+    "noise_level", "wifi_quality", "outlets_level", "comfort_level",
+    "food_type", "group_suitability", "time_limit_status", "bathroom_status"
+]
+BOOL_FIELDS = ["is_late_night", "has_natural_light"]
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "86400"))
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("SNAPSHOT_CHECK_SECONDS", "5"))
+
+# --- Z-order keys ---
+
+def _quantize(lat, lng):
+    qy = ((np.asarray(lat, dtype=np.float64) + 90) / 180 * 0xFFFFFFFF).astype(np.uint64)
+    qx = ((np.asarray(lng, dtype=np.float64) + 180) / 360 * 0xFFFFFFFF).astype(np.uint64)
+    return qy, qx
+
+def _spread_bits(v):
+    """Inserts a zero bit between each of the low 32 bits of v."""
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+def morton_keys(lat, lng):
+    qy, qx = _quantize(lat, lng)
+    return (_spread_bits(qy) << np.uint64(1)) | _spread_bits(qx)
+
+def _key_ranges(south, west, north, east, max_cells=16):
+    """Key ranges [lo, hi) of the coarsest Z-order cells that cover the bbox (at most max_cells)."""
+    qy, qx = _quantize([south, north], [west, east])
+    for level in range(32, 0, -1):
+        shift = 32 - level
+        y_lo, y_hi = int(qy[0]) >> shift, int(qy[1]) >> shift
+        x_lo, x_hi = int(qx[0]) >> shift, int(qx[1]) >> shift
+        if (y_hi - y_lo + 1) * (x_hi - x_lo + 1) <= max_cells:
+            break
+    ys = np.repeat(np.arange(y_lo, y_hi + 1, dtype=np.uint64), x_hi - x_lo + 1)
+    xs = np.tile(np.arange(x_lo, x_hi + 1, dtype=np.uint64), y_hi - y_lo + 1)
+    prefixes = np.sort((_spread_bits(ys) << np.uint64(1)) | _spread_bits(xs))
+    return [(int(p) << (2 * shift), (int(p) + 1) << (2 * shift)) for p in prefixes]
+
+# --- Writer ---
+
+def write_snapshot(path, rows):
+    """
+    Writes rows (dicts with id, lat, lng, rating, price_level, open_week, utc_offset_minutes
+    and the vibe/string columns) to path via a temp file and an atomic rename.
+    """
+    n = len(rows)
+    lat = np.array([r['lat'] for r in rows], dtype=np.float64)
+    lng = np.array([r['lng'] for r in rows], dtype=np.float64)
+    keys = morton_keys(lat, lng)
+    order = np.argsort(keys, kind="stable")
+    rows = [rows[i] for i in order]
+
+    sections = {
+        "keys": keys[order],
+        "lat": lat[order].astype(np.float32),
+        "lng": lng[order].astype(np.float32),
+        "id": np.array([r['id'] for r in rows], dtype=np.int64),
+        "rating": np.array([np.nan if r.get('rating') is None else r['rating'] for r in rows], dtype=np.float32),
+        "price_level": np.array([-1 if r.get('price_level') is None else r['price_level'] for r in rows], dtype=np.int8),
+        "utc_offset_minutes": np.array(
+            [NULL_OFFSET if r.get('utc_offset_minutes') is None else r['utc_offset_minutes'] for r in rows], dtype=np.int16
+        ),
+    }
+
+    open_week = np.zeros((n, WEEK_SLOTS // 8), dtype=np.uint8)
+    for i, r in enumerate(rows):
+        if r.get('open_week'):
+            open_week[i] = np.frombuffer(bytes(r['open_week']), dtype=np.uint8)
+    sections["open_week"] = open_week
+
+    vectors = np.zeros((n, DIM), dtype=np.float16)
+    for i, r in enumerate(rows):
+        if r.get('summary'):
+            vectors[i] = embed(place_document(r))
+    sections["vectors"] = vectors
+
+    vocab = {}
+    for field in ENUM_FIELDS:
+        values = sorted({r.get(field) for r in rows if r.get(field)})
+        vocab[field] = values
+        codes = {v: i + 1 for i, v in enumerate(values)}
+        dtype = np.uint8 if len(values) < 255 else np.uint16
+        sections[f"enum:{field}"] = np.array([codes.get(r.get(field), 0) for r in rows], dtype=dtype)
+
+    for field in BOOL_FIELDS:
+        sections[f"bool:{field}"] = np.array([-1 if r.get(field) is None else int(r[field]) for r in rows], dtype=np.int8)
+
+    blob = bytearray()
+    for field in STRING_FIELDS + LIST_FIELDS:
+        offsets = np.zeros(n + 1, dtype=np.uint64)
+        for i, r in enumerate(rows):
+            value = r.get(field)
+            if field in LIST_FIELDS:
+                value = LIST_SEP.join(value) if value else None
+            if value:
+                blob += value.encode()
+            offsets[i + 1] = len(blob)
+        sections[f"str:{field}"] = offsets
+    sections["blob"] = np.frombuffer(bytes(blob), dtype=np.uint8)
+
+    # Header size depends on the offsets it contains, so lay out with a generous reservation
+    max_id = int(sections["id"].max()) if n else 0
+    header = {"count": n, "built_at": time.time(), "max_id": max_id, "vocab": vocab, "sections": {}}
+    reserve = len(json.dumps({**header, "sections": {k: [0, v.dtype.str, list(v.shape)] for k, v in sections.items()}})) + 1024
+    data_start = -(-(len(MAGIC) + 8 + reserve) // ALIGN) * ALIGN
+    offset = data_start
+    for name, arr in sections.items():
+        header["sections"][name] = [offset, arr.dtype.str, list(arr.shape)]
+        offset = -(-(offset + arr.nbytes) // ALIGN) * ALIGN
+    header_bytes = json.dumps(header).encode()
+    if len(MAGIC) + 8 + len(header_bytes) > data_start:
+        raise ValueError("Snapshot header outgrew its reservation")
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, arr in sections.items():
+            f.seek(header["sections"][name][0])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers holding the old file keep their mapping; new opens see the new inode
+    os.replace(tmp_path, path)
+    return n
+
+# --- Reader ---
+
+class CafeSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_mtime_ns)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a cafe snapshot")
+        header_len = int.from_bytes(self.mm[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(self.mm[start:start + header_len])
+
+        self.count = header['count']
+        self.built_at = header['built_at']
+        self.max_id = header.get('max_id', 0)
+        self.vocab = header['vocab']
+        # Zero-copy views into the mapping
+        self.arrays = {
+            name: np.frombuffer(self.mm, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=off).reshape(shape)
+            for name, (off, dtype, shape) in header['sections'].items()
+        }
+        self.keys = self.arrays['keys']
+        self.lats = self.arrays['lat']
+        self.lngs = self.arrays['lng']
+        self.vectors = self.arrays.get('vectors')  # None in files exported before vectors were added
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, field, i):
+        offsets = self.arrays[f"str:{field}"]
+        lo, hi = int(offsets[i]), int(offsets[i + 1])
+        return self.arrays['blob'][lo:hi].tobytes().decode() if hi > lo else None
+
+    def row(self, i, distance_km):
+        """One place in the same shape as nearby.nearby_rows returns."""
+        rating = float(self.arrays['rating'][i])
+        price = int(self.arrays['price_level'][i])
+        row = {
+            "id": int(self.arrays['id'][i]),
+            "rating": None if np.isnan(rating) else round(rating, 2),
+            "price_level": None if price < 0 else price,
+            "lat": float(self.lats[i]),
+            "lng": float(self.lngs[i]),
+            "distance_km": distance_km,
+        }
+        for field in STRING_FIELDS:
+            row[field] = self._string(field, i)
+        for field in LIST_FIELDS:
+            value = self._string(field, i)
+            row[field] = value.split(LIST_SEP) if value else []
+        for field in ENUM_FIELDS:
+            code = int(self.arrays[f"enum:{field}"][i])
+            row[field] = self.vocab[field][code - 1] if code else None
+        for field in BOOL_FIELDS:
+            flag = int(self.arrays[f"bool:{field}"][i])
+            row[field] = None if flag < 0 else bool(flag)
+        return row
+
+    def _candidates(self, lat, lng, radius_km):
+        south, north, lng_ranges = circle_bbox(lat, lng, radius_km)
+        slices = []
+        for west, east in lng_ranges:
+            for lo, hi in _key_ranges(south, west, north, east):
+                i = np.searchsorted(self.keys, np.uint64(lo), side="left")
+                j = np.searchsorted(self.keys, np.uint64(min(hi, 2 ** 64 - 1)), side="left")
+                if j > i:
+                    slices.append(np.arange(i, j))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        # The two halves of a wrapped box can land in the same coarse Z-order cell
+        return np.unique(np.concatenate(slices))
+
+    def within(self, lat, lng, radius_km):
+        """(row indices, distances in km) of every place within radius_km of (lat, lng), unordered."""
+        idx = self._candidates(lat, lng, radius_km)
+        if idx.size == 0:
+            return idx, np.empty(0)
+
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2 = np.radians(self.lats[idx].astype(np.float64))
+        lng2 = np.radians(self.lngs[idx].astype(np.float64))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+        keep = dist <= radius_km
+        return idx[keep], dist[keep]
+
+    def has_text(self, field, idx):
+        """Boolean mask: which of the rows idx have a non-empty string in field."""
+        offsets = self.arrays[f"str:{field}"]
+        return offsets[idx + 1] > offsets[idx]
+
+    def nearby(self, lat, lng, radius_km, limit, open_at=None):
+        """Top `limit` places within radius_km of (lat, lng), nearest first."""
+        idx, dist = self.within(lat, lng, radius_km)
+        if open_at is not None and idx.size:
+            # Same check as hours.OPEN_AT_SQL, vectorized over the candidates
+            minute_of_week, use_offset = open_at
+            minute = np.full(idx.size, minute_of_week, dtype=np.int64)
+            if use_offset:
+                offsets = self.arrays['utc_offset_minutes'][idx].astype(np.int64)
+                minute += np.where(offsets == NULL_OFFSET, 0, offsets)
+            slot = (minute % WEEK_MINUTES) // SLOT_MINUTES
+            is_open = (self.arrays['open_week'][idx, slot // 8] >> (slot % 8).astype(np.uint8)) & 1
+            idx, dist = idx[is_open == 1], dist[is_open == 1]
+        if idx.size == 0:
+            return []
+
+        k = min(limit, idx.size)
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top])]
+        return [self.row(int(idx[t]), float(dist[t])) for t in top]
+
+class SnapshotReader:
+    """Current snapshot for this process; re-opens it when the file is atomically replaced."""
+
+    def __init__(self, path=SNAPSHOT_PATH, max_age_seconds=SNAPSHOT_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.snapshot = None
+            return
+        if self.snapshot is None or self.snapshot.identity != (st.st_ino, st.st_mtime_ns):
+            try:
+                new_snapshot = CafeSnapshot(self.path)
+                # Reference swap: queries in flight keep the old mapping until they finish
+                self.snapshot = new_snapshot
+                print(f"🗺️ Snapshot loaded: {len(new_snapshot)} places")
+            except Exception as e:
+                print(f"Snapshot Load Error: {e}")
+
+    def current(self):
+        """The loaded snapshot, or None when disabled, missing or older than max_age_seconds."""
+        if not self.path:
+            return None
+        if time.monotonic() - self.checked_at > SNAPSHOT_CHECK_SECONDS and self.lock.acquire(blocking=False):
+            try:
+                self._refresh()
+                self.checked_at = time.monotonic()
+            finally:
+                self.lock.release()
+        snapshot = self.snapshot
+        if snapshot is None or time.time() - snapshot.built_at > self.max_age_seconds:
+            return None
+        return snapshot
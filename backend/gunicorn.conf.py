@@ -0,0 +1,23 @@
+# Production serving: `gunicorn -c gunicorn.conf.py app.main:app`
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Async workers: one per core is enough, the event loop handles concurrency inside each
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# SIGTERM -> workers set `draining`, live-mining streams wrap up with `event: done`,
+# and anything still open after graceful_timeout is killed. Streams only check `draining`
+# between places, so this must outlast one vibe call (enrichment.AI_MAX_ATTEMPTS x
+# AI_TIMEOUT_SECONDS + backoff = 3 x 15 + 2 + 4 = 51s) plus saving the place
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "75"))
+timeout = 120          # Live mining streams can legitimately run for a while
+keepalive = 5
+
+# Recycle workers periodically to cap memory growth (semantic index, caches)
+max_requests = 5000
+max_requests_jitter = 500
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,71 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+conn = None
+cursor = None
+try:
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    cursor = conn.cursor()
+
+    print("🚀 Adding demand-driven mining tables...")
+
+    # Geocoded location for each city request (filled in by demand_scheduler.py)
+    cursor.execute("""
+        ALTER TABLE city_requests
+            ADD COLUMN IF NOT EXISTS lat FLOAT,
+            ADD COLUMN IF NOT EXISTS lng FLOAT,
+            ADD COLUMN IF NOT EXISTS geocode_failed BOOLEAN DEFAULT FALSE;
+    """)
+
+    # Every /cafes search that fell below MIN_CACHED_RESULTS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_misses (
+            id SERIAL PRIMARY KEY,
+            lat FLOAT NOT NULL,
+            lng FLOAT NOT NULL,
+            radius_km FLOAT,
+            cached_count INT,
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    cursor.execute("ALTER TABLE cache_misses ADD COLUMN IF NOT EXISTS source TEXT NOT NULL DEFAULT 'live';")  # live | prefetch
+    cursor.execute("CREATE INDEX IF NOT EXISTS cache_misses_created_idx ON cache_misses (created_at);")
+
+    # Ranked areas waiting to be mined, keyed by geohash cell
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mining_queue (
+            cell TEXT PRIMARY KEY,
+            lat FLOAT NOT NULL,
+            lng FLOAT NOT NULL,
+            demand FLOAT NOT NULL DEFAULT 0,
+            cached_count INT DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'queued',   -- queued | mined | covered
+            updated_at TIMESTAMP DEFAULT NOW(),
+            last_mined_at TIMESTAMP
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS mining_queue_status_idx ON mining_queue (status, demand DESC);")
+
+    # Daily upstream API spend per source (live | scheduler | sweep)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mining_spend (
+            day DATE NOT NULL DEFAULT CURRENT_DATE,
+            source TEXT NOT NULL,
+            places_calls INT NOT NULL DEFAULT 0,
+            ai_calls INT NOT NULL DEFAULT 0,
+            geocode_calls INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, source)
+        );
+    """)
+
+    conn.commit()
+    print("✅ Tables created successfully.")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    if cursor: cursor.close()
+    if conn: conn.close()
@@ -0,0 +1,26 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+conn = None
+cursor = None
+try:
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    cursor = conn.cursor()
+
+    print("🚀 Adding opening-hours columns...")
+
+    # 252-byte weekly bitmap of 5-minute slots in local time (see app/hours.py), NULL = hours unknown
+    cursor.execute("ALTER TABLE places ADD COLUMN IF NOT EXISTS open_week BYTEA;")
+    cursor.execute("ALTER TABLE places ADD COLUMN IF NOT EXISTS utc_offset_minutes INT;")
+
+    conn.commit()
+    print("✅ Columns added. Run scripts/delta_sync.py to backfill hours for existing places.")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    if cursor: cursor.close()
+    if conn: conn.close()
@@ -0,0 +1,40 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+conn = None
+cursor = None
+try:
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    cursor = conn.cursor()
+
+    print("🚀 Adding shared-state tables for multi-worker mode...")
+
+    # UNLOGGED: no WAL writes, contents are disposable (lost on crash, which is fine for a cache)
+    cursor.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS shared_cache (
+            key TEXT PRIMARY KEY,
+            value JSONB NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS shared_cache_expires_idx ON shared_cache (expires_at);")
+
+    cursor.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+            name TEXT PRIMARY KEY,
+            tokens FLOAT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """)
+
+    conn.commit()
+    print("✅ Tables created successfully. Set SHARED_STATE_BACKEND=postgres to use them.")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    if cursor: cursor.close()
+    if conn: conn.close()
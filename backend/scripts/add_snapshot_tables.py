@@ -0,0 +1,49 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+conn = None
+cursor = None
+try:
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    cursor = conn.cursor()
+
+    print("🚀 Adding rating/price snapshot tables...")
+
+    cursor.execute("ALTER TABLE places ADD COLUMN IF NOT EXISTS user_rating_count INT;")
+    cursor.execute("ALTER TABLE places ADD COLUMN IF NOT EXISTS business_status TEXT;")
+
+    # Append-only history: one row per observed change, never updated
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS place_snapshots (
+            id BIGSERIAL PRIMARY KEY,
+            place_id INT NOT NULL REFERENCES places(id) ON DELETE CASCADE,
+            rating FLOAT,
+            user_rating_count INT,
+            price_level INT,
+            business_status TEXT,
+            captured_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS place_snapshots_place_idx ON place_snapshots (place_id, captured_at DESC);")
+
+    # Delta sync works area by area; this is where it remembers how fresh each area is
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_cells (
+            cell TEXT PRIMARY KEY,
+            synced_at TIMESTAMPTZ NOT NULL,
+            places_seen INT NOT NULL DEFAULT 0,
+            places_changed INT NOT NULL DEFAULT 0
+        );
+    """)
+
+    conn.commit()
+    print("✅ Tables created successfully.")
+
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    if cursor: cursor.close()
+    if conn: conn.close()
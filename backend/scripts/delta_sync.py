@@ -0,0 +1,247 @@
+"""
+Delta Sync: keeps rating, review count, price level, business status and hours fresh.
+
+Usage:
+    python backend/scripts/delta_sync.py                          # Stalest areas first
+    python backend/scripts/delta_sync.py --bbox 43.45,-80.56,43.49,-80.50
+    python backend/scripts/delta_sync.py --max-calls 200 --stale-hours 24
+    python backend/scripts/delta_sync.py --dry-run
+
+Known places are grouped into geohash-6 cells (~1.2 x 0.6km). Each cell is re-read
+with one searchNearby call using a minimal field mask (no reviews, no AI), so a
+refresh costs about one call per 20 places. Cells that come back full are split into
+smaller circles; places still unmatched after that get a Place Details call.
+
+Only differences are written: a changed place gets one row appended to
+place_snapshots and its places row updated. Unchanged places are not touched.
+
+Run scripts/add_snapshot_tables.py and scripts/add_hours_columns.py once before the first sync.
+"""
+import sys
+import os
+import argparse
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.geo import haversine, geohash_encode, geohash_bbox, geohash_center, split_tile
+from app.demand import record_spend
+from app.enrichment import search_places_nearby, get_place_details, price_level_to_int
+from app.hours import week_bitmap
+
+load_dotenv()
+
+MAPS_KEY = os.getenv("GMAPS_KEY")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+SYNC_CELL_PRECISION = 6
+PLACES_MAX_RESULTS = 20
+SYNC_FIELD_MASK = ("places.id,places.rating,places.userRatingCount,places.priceLevel,places.businessStatus,"
+                   "places.regularOpeningHours,places.utcOffsetMinutes")
+DETAILS_FIELD_MASK = "id,rating,userRatingCount,priceLevel,businessStatus,regularOpeningHours,utcOffsetMinutes"
+TRACKED_FIELDS = ["rating", "user_rating_count", "price_level", "business_status"]
+# Refreshed in places but not snapshotted (hours history isn't useful, and the offset moves with DST)
+HOURS_FIELDS = ["open_week", "utc_offset_minutes"]
+
+def observed_fields(place):
+    """Maps a Places response onto the tracked places columns."""
+    return {
+        "rating": place.get('rating'),
+        "user_rating_count": place.get('userRatingCount'),
+        "price_level": price_level_to_int(place.get('priceLevel')),
+        "business_status": place.get('businessStatus'),
+        "open_week": week_bitmap(place.get('regularOpeningHours')),
+        "utc_offset_minutes": place.get('utcOffsetMinutes'),
+    }
+
+def load_known_places(cursor, bbox=None):
+    """Returns {cell: {google_place_id: row}} for every place (optionally inside a bbox)."""
+    query = f"""
+        SELECT p.id, p.google_place_id, {", ".join("p." + f for f in TRACKED_FIELDS + HOURS_FIELDS)},
+            ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng
+        FROM places p
+    """
+    params = ()
+    if bbox:
+        south, west, north, east = bbox
+        query += " WHERE p.location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)"
+        params = (west, south, east, north)
+    cursor.execute(query, params)
+
+    cells = {}
+    for row in cursor.fetchall():
+        cell = geohash_encode(row['lat'], row['lng'], SYNC_CELL_PRECISION)
+        place = dict(row)
+        if place['open_week'] is not None:
+            place['open_week'] = bytes(place['open_week'])  # memoryview -> bytes for comparison
+        cells.setdefault(cell, {})[row['google_place_id']] = place
+    return cells
+
+def stale_cells(cursor, cells, stale_hours):
+    """Cells never synced first, then the least recently synced, skipping fresh ones."""
+    cursor.execute("""
+        SELECT cell, synced_at, synced_at > NOW() - make_interval(hours => %s) AS fresh
+        FROM sync_cells WHERE cell = ANY(%s);
+    """, (stale_hours, list(cells)))
+    synced = {row['cell']: row for row in cursor.fetchall()}
+
+    todo = [c for c in cells if not (c in synced and synced[c]['fresh'])]
+    todo.sort(key=lambda c: (c in synced, synced[c]['synced_at'] if c in synced else None))
+    return todo
+
+def apply_observation(cursor, known, observed):
+    """Appends a snapshot and updates places if anything changed. Returns True on change."""
+    if any(known[f] != observed[f] for f in HOURS_FIELDS):
+        cursor.execute(
+            "UPDATE places SET open_week = %s, utc_offset_minutes = %s WHERE id = %s;",
+            (observed['open_week'], observed['utc_offset_minutes'], known['id'])
+        )
+    if all(known[f] == observed[f] for f in TRACKED_FIELDS):
+        return False
+    values = [observed[f] for f in TRACKED_FIELDS]
+    cursor.execute(f"""
+        INSERT INTO place_snapshots (place_id, {", ".join(TRACKED_FIELDS)})
+        VALUES (%s, {", ".join(["%s"] * len(TRACKED_FIELDS))});
+    """, [known['id']] + values)
+    cursor.execute(f"""
+        UPDATE places SET {", ".join(f + " = %s" for f in TRACKED_FIELDS)} WHERE id = %s;
+    """, values + [known['id']])
+    return True
+
+class DeltaSync:
+    def __init__(self, max_calls=None, max_depth=2, dry_run=False):
+        self.max_calls = max_calls
+        self.max_depth = max_depth
+        self.dry_run = dry_run
+        self.cut_short = False
+        self.search_failed = False
+        self.stats = {"cells": 0, "places_calls": 0, "details_calls": 0, "seen": 0, "changed": 0, "missed": 0,
+                      "failed_cells": 0}
+
+    def _calls(self):
+        return self.stats["places_calls"] + self.stats["details_calls"]
+
+    def has_budget(self):
+        return self.max_calls is None or self._calls() < self.max_calls
+
+    def _search_circle(self, lat, lng, radius_km, pending, observations, depth):
+        if not self.has_budget():
+            self.cut_short = True
+            return
+        self.stats["places_calls"] += 1
+        results = search_places_nearby(lat, lng, radius_km, max_count=PLACES_MAX_RESULTS, field_mask=SYNC_FIELD_MASK)
+        if results is None:
+            # Failed search, not an empty area: don't fall back to one Details call per place
+            self.search_failed = True
+            return
+        for place in results:
+            pid = place.get('id')
+            if pid in pending:
+                observations[pid] = observed_fields(place)
+                del pending[pid]
+
+        # A full page may have pushed known places out: look closer where they still are
+        if len(results) >= PLACES_MAX_RESULTS and depth < self.max_depth:
+            for c_lat, c_lng, c_r in split_tile(lat, lng, radius_km):
+                if any(haversine(c_lng, c_lat, p['lng'], p['lat']) <= c_r for p in pending.values()):
+                    self._search_circle(c_lat, c_lng, c_r, pending, observations, depth + 1)
+
+    def sync_cell(self, conn, cursor, cell, known):
+        south, west, north, east = geohash_bbox(cell)
+        c_lat, c_lng = geohash_center(cell)
+        radius_km = haversine(west, south, east, north) / 2
+        self.stats["cells"] += 1
+
+        if self.dry_run:
+            print(f"  [dry-run] {cell}: {len(known)} places, r={radius_km:.2f}km")
+            return
+
+        pending = dict(known)
+        observations = {}
+        self.cut_short = False
+        self.search_failed = False
+        self._search_circle(c_lat, c_lng, radius_km, pending, observations, 0)
+
+        if self.search_failed:
+            # Left stale so the next run retries it; whatever was observed is still kept
+            self.cut_short = True
+            self.stats["failed_cells"] += 1
+        else:
+            for pid in list(pending):
+                if not self.has_budget():
+                    self.cut_short = True
+                    break
+                self.stats["details_calls"] += 1
+                place = get_place_details(pid, DETAILS_FIELD_MASK)
+                if place:
+                    observations[pid] = observed_fields(place)
+                    del pending[pid]
+
+        changed = 0
+        for pid, observed in observations.items():
+            if apply_observation(cursor, known[pid], observed):
+                changed += 1
+        self.stats["seen"] += len(observations)
+        self.stats["changed"] += changed
+        self.stats["missed"] += len(pending)
+
+        # A cell cut short by the budget or a failed search stays stale so the next run picks it up first.
+        # Places Details couldn't find (e.g. removed listings) don't hold the cell back.
+        if not self.cut_short:
+            cursor.execute("""
+                INSERT INTO sync_cells (cell, synced_at, places_seen, places_changed)
+                VALUES (%s, NOW(), %s, %s)
+                ON CONFLICT (cell) DO UPDATE SET
+                    synced_at = NOW(), places_seen = EXCLUDED.places_seen, places_changed = EXCLUDED.places_changed;
+            """, (cell, len(observations), changed))
+        conn.commit()
+        print(f"  -> {cell}: {len(observations)}/{len(known)} seen, {changed} changed")
+
+    def record_spend(self, cursor):
+        if self._calls():
+            record_spend(cursor, "delta_sync", places_calls=self._calls())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh rating/price fields of known places.")
+    parser.add_argument("--bbox", help="south,west,north,east")
+    parser.add_argument("--stale-hours", type=int, default=72, help="Skip cells synced more recently than this")
+    parser.add_argument("--max-calls", type=int, help="Stop after this many Places API calls")
+    parser.add_argument("--max-depth", type=int, default=2, help="How many times a full cell may be split")
+    parser.add_argument("--dry-run", action="store_true", help="List the cells that would be synced")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not args.dry_run and not MAPS_KEY:
+        print("❌ ERROR: Missing Keys in .env")
+        exit(1)
+
+    bbox = [float(v) for v in args.bbox.split(",")] if args.bbox else None
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    sync = DeltaSync(max_calls=args.max_calls, max_depth=args.max_depth, dry_run=args.dry_run)
+    try:
+        cells = load_known_places(cursor, bbox)
+        todo = stale_cells(cursor, cells, args.stale_hours)
+        print(f"🔄 {len(todo)} of {len(cells)} cells need a sync")
+
+        for cell in todo:
+            if not sync.has_budget():
+                print("💸 Call budget exhausted, stopping.")
+                break
+            sync.sync_cell(conn, cursor, cell, cells[cell])
+    finally:
+        if not args.dry_run:
+            sync.record_spend(cursor)
+            conn.commit()
+        cursor.close()
+        conn.close()
+
+    s = sync.stats
+    print(f"✅ {s['cells']} cells, {s['seen']} places seen, {s['changed']} changed, {s['missed']} missed, "
+          f"{s['failed_cells']} failed "
+          f"({s['places_calls']} nearby + {s['details_calls']} details calls)")
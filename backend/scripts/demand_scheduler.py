@@ -0,0 +1,183 @@
+"""
+Demand Scheduler: spends the daily mining budget where users actually search.
+
+Usage:
+    python backend/scripts/demand_scheduler.py                 # One pass (cron-friendly)
+    python backend/scripts/demand_scheduler.py --loop 3600     # Run every hour
+    python backend/scripts/demand_scheduler.py --dry-run       # Rank areas, don't mine
+
+Each pass:
+  1. Geocodes new rows in city_requests.
+  2. Buckets city_requests + /cafes cache misses into geohash cells, weighted by recency.
+  3. Refreshes mining_queue, marking cells that are already well covered.
+  4. Sweeps the highest-demand queued cells until MINING_DAILY_BUDGET is used up.
+
+Run scripts/add_demand_tables.py once before the first pass.
+"""
+import sys
+import os
+import time
+import argparse
+import requests
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.geo import geohash_bbox, geohash_center
+from app.demand import MINING_DAILY_BUDGET, aggregate_demand, record_spend, get_spend_today
+from sweep import Sweep
+
+load_dotenv()
+
+MAPS_KEY = os.getenv("GMAPS_KEY")
+AI_KEY = os.getenv("GEMINI_API_KEY")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+COVERED_CELL_PLACES = 40   # A ~5km cell with this many cafes doesn't need more mining
+REMINE_AFTER_DAYS = 30     # A mined cell re-enters the queue if demand persists after this long
+GEOCODE_BATCH = 50
+
+def geocode(address):
+    try:
+        resp = requests.get("https://maps.googleapis.com/maps/api/geocode/json",
+                            params={"address": address, "key": MAPS_KEY}, timeout=10)
+        data = resp.json()
+        if data['status'] != 'OK': return None
+        loc = data['results'][0]['geometry']['location']
+        return loc['lat'], loc['lng']
+    except Exception as e:
+        print(f"❌ Geocode Error: {e}")
+        return None
+
+def budget_remaining(cursor, budget):
+    spent = get_spend_today(cursor).get("scheduler", {}).get("total", 0)
+    return max(0, budget - spent)
+
+def geocode_pending_requests(conn, cursor, budget):
+    cursor.execute("""
+        SELECT id, city FROM city_requests
+        WHERE lat IS NULL AND NOT COALESCE(geocode_failed, FALSE)
+        ORDER BY created_at DESC LIMIT %s;
+    """, (min(GEOCODE_BATCH, budget_remaining(cursor, budget)),))
+    rows = cursor.fetchall()
+
+    # Same city typed by many users only costs one lookup
+    cache = {}
+    calls = 0
+    for req_id, city in rows:
+        key = city.strip().lower()
+        if key not in cache:
+            cache[key] = geocode(city)
+            calls += 1
+        coords = cache[key]
+        if coords:
+            cursor.execute("UPDATE city_requests SET lat = %s, lng = %s WHERE id = %s", (coords[0], coords[1], req_id))
+        else:
+            cursor.execute("UPDATE city_requests SET geocode_failed = TRUE WHERE id = %s", (req_id,))
+
+    if calls:
+        record_spend(cursor, "scheduler", geocode_calls=calls)
+    conn.commit()
+    print(f"🌍 Geocoded {len(rows)} requests ({calls} API calls)")
+
+def cell_place_count(cursor, cell):
+    south, west, north, east = geohash_bbox(cell)
+    cursor.execute(
+        "SELECT COUNT(*) FROM places WHERE location && ST_MakeEnvelope(%s, %s, %s, %s, 4326);",
+        (west, south, east, north)
+    )
+    return cursor.fetchone()[0]
+
+def refresh_queue(conn, cursor):
+    scores = aggregate_demand(cursor)
+    for cell, demand in scores.items():
+        lat, lng = geohash_center(cell)
+        cached = cell_place_count(cursor, cell)
+        status = 'covered' if cached >= COVERED_CELL_PLACES else 'queued'
+        cursor.execute("""
+            INSERT INTO mining_queue (cell, lat, lng, demand, cached_count, status, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (cell) DO UPDATE SET
+                demand = EXCLUDED.demand,
+                cached_count = EXCLUDED.cached_count,
+                updated_at = NOW(),
+                status = CASE
+                    WHEN EXCLUDED.status = 'covered' THEN 'covered'
+                    WHEN mining_queue.status = 'mined'
+                         AND mining_queue.last_mined_at > NOW() - make_interval(days => %s) THEN 'mined'
+                    ELSE 'queued'
+                END;
+        """, (cell, lat, lng, demand, cached, status, REMINE_AFTER_DAYS))
+
+    # Cells whose demand aged out of the window drop to zero rather than lingering at the top
+    cursor.execute("UPDATE mining_queue SET demand = 0 WHERE NOT (cell = ANY(%s));", (list(scores),))
+    conn.commit()
+    print(f"📊 Ranked {len(scores)} demand cells")
+
+def mine_top_cells(conn, cursor, budget, max_areas, workers, dry_run=False):
+    cursor.execute("""
+        SELECT cell, demand FROM mining_queue
+        WHERE status = 'queued' AND demand > 0
+        ORDER BY demand DESC LIMIT %s;
+    """, (max_areas,))
+    cells = cursor.fetchall()
+
+    for cell, demand in cells:
+        remaining = budget_remaining(cursor, budget)
+        if remaining <= 0 and not dry_run:
+            print("💸 Daily budget exhausted, stopping.")
+            break
+
+        print(f"📍 Mining cell {cell} (demand {demand:.1f}, budget left {remaining})...")
+        sweep = Sweep(workers=workers, dry_run=dry_run, max_calls=remaining)
+        sweep.plan_area(*geohash_bbox(cell))
+        stats = sweep.run()
+        if dry_run:
+            continue
+
+        sweep.record_spend("scheduler")
+        # Only retire the cell if the sweep wasn't cut short by the budget
+        if stats["tiles_over_budget"] == 0:
+            cursor.execute(
+                "UPDATE mining_queue SET status = 'mined', last_mined_at = NOW(), updated_at = NOW() WHERE cell = %s",
+                (cell,)
+            )
+        conn.commit()
+
+def run_once(args):
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor()
+    try:
+        if not args.dry_run:
+            geocode_pending_requests(conn, cursor, args.budget)
+        refresh_queue(conn, cursor)
+        mine_top_cells(conn, cursor, args.budget, args.max_areas, args.workers, dry_run=args.dry_run)
+    finally:
+        cursor.close()
+        conn.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mine the areas users are asking for, within a daily budget.")
+    parser.add_argument("--budget", type=int, default=MINING_DAILY_BUDGET, help="Daily upstream call budget")
+    parser.add_argument("--max-areas", type=int, default=5, help="Max cells to sweep per pass")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--loop", type=int, help="Seconds between passes (default: run once)")
+    parser.add_argument("--dry-run", action="store_true", help="Rank and plan without calling Google/Gemini")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not args.dry_run and (not MAPS_KEY or not AI_KEY):
+        print("❌ ERROR: Missing Keys in .env")
+        exit(1)
+
+    while True:
+        try:
+            run_once(args)
+        except Exception as e:
+            print(f"❌ Scheduler pass failed: {e}")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
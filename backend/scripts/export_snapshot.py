@@ -0,0 +1,75 @@
+"""
+Snapshot Export: writes places + place_vibes to the memory-mapped file the API reads.
+
+Usage:
+    python backend/scripts/export_snapshot.py --out /data/cafes.snap
+    python backend/scripts/export_snapshot.py --out /data/cafes.snap --loop 900   # Every 15 minutes
+
+The semantic-search vectors are embedded here too (once per export instead of once per
+worker). Point the API at the same file with SNAPSHOT_PATH. The file is written next to the
+target and swapped in with an atomic rename, so workers pick up the new version on
+their next check without ever seeing a half-written file.
+"""
+import sys
+import os
+import time
+import argparse
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.nearby import VIBE_FIELDS
+from app.snapshot import SNAPSHOT_PATH, write_snapshot
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+EXPORT_QUERY = f"""
+    SELECT
+        p.id, p.google_place_id, p.name, p.address, p.rating, p.price_level,
+        p.open_week, p.utc_offset_minutes,
+        ST_Y(p.location::geometry) as lat, ST_X(p.location::geometry) as lng,
+        {", ".join("v." + f for f in VIBE_FIELDS)}
+    FROM places p
+    LEFT JOIN place_vibes v ON p.id = v.place_id
+    WHERE p.location IS NOT NULL;
+"""
+
+def export(out_path):
+    started = time.time()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(EXPORT_QUERY)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    count = write_snapshot(out_path, rows)
+    size_mb = os.path.getsize(out_path) / 1e6
+    print(f"✅ Exported {count} places to {out_path} ({size_mb:.1f} MB) in {time.time() - started:.1f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export the cafe snapshot for DB-free reads.")
+    parser.add_argument("--out", default=SNAPSHOT_PATH, help="Snapshot file (default: $SNAPSHOT_PATH)")
+    parser.add_argument("--loop", type=int, help="Seconds between exports (default: run once)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not args.out:
+        print("❌ ERROR: Pass --out or set SNAPSHOT_PATH")
+        exit(1)
+
+    while True:
+        try:
+            export(args.out)
+        except Exception as e:
+            print(f"❌ Export failed: {e}")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
@@ -0,0 +1,73 @@
+"""
+Load test for the /cafes read path.
+
+Usage:
+    python backend/scripts/load_test.py --url http://localhost:8001 --concurrency 64 --duration 30
+    python backend/scripts/load_test.py --url http://localhost:8001 --lat 37.78 --lng -122.40
+
+Each virtual client repeatedly opens /cafes and reads the stream to `event: done`,
+jittering the location a little so requests spread over nearby cache cells. Point it
+at an area that is already well covered, otherwise you are load-testing Google/Gemini.
+
+To check scaling, run it against the prod container with WEB_CONCURRENCY=1, 2, 4, ...
+and compare req/s.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+async def client(http, args, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        params = {
+            "lat": args.lat + random.uniform(-args.jitter, args.jitter),
+            "lng": args.lng + random.uniform(-args.jitter, args.jitter),
+            "radius_km": args.radius_km,
+        }
+        started = time.monotonic()
+        try:
+            async with http.stream("GET", f"{args.url}/cafes", params=params) as resp:
+                if resp.status_code != 200:
+                    errors.append(resp.status_code)
+                    continue
+                async for _ in resp.aiter_bytes():
+                    pass
+            latencies.append(time.monotonic() - started)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+async def run(args):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as http:
+        deadline = time.monotonic() + args.duration
+        started = time.monotonic()
+        await asyncio.gather(*(client(http, args, deadline, latencies, errors) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+
+    if not latencies:
+        print(f"❌ No successful requests ({len(errors)} errors: {errors[:5]})")
+        return
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"📈 {len(latencies)} requests in {elapsed:.1f}s -> {len(latencies) / elapsed:.1f} req/s "
+          f"(concurrency {args.concurrency}, {len(errors)} errors)")
+    print(f"   latency ms: p50 {p(0.50):.1f} | p95 {p(0.95):.1f} | p99 {p(0.99):.1f} | mean {statistics.mean(latencies) * 1000:.1f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure /cafes throughput.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--lat", type=float, default=37.7785)   # SoMa, seeded by sweep.py
+    parser.add_argument("--lng", type=float, default=-122.4000)
+    parser.add_argument("--jitter", type=float, default=0.01, help="Degrees of random offset per request")
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=int, default=30, help="Seconds")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,350 @@
+"""
+Sweep Planner: mines a whole area with Places searchNearby instead of hand-written text queries.
+
+Usage:
+    python backend/scripts/sweep.py --all-regions
+    python backend/scripts/sweep.py --region sf-soma --region nyc-bushwick
+    python backend/scripts/sweep.py --bbox 43.45,-80.56,43.49,-80.50
+    python backend/scripts/sweep.py --polygon waterloo.geojson --workers 8
+    python backend/scripts/sweep.py --region mit --dry-run
+
+The area is tiled into circles sized by known cafe density (the largest tiles when the
+DB has no data for the area yet, but never larger than the area itself), tiles that
+already have enough places in the DB are skipped, and a tile that comes back full
+(20 results, the API cap) is split into 7 smaller circles, up to MAX_SPLIT_DEPTH times,
+so dense blocks still get full coverage. Tiles and places outside the area are dropped.
+"""
+import sys
+import os
+import json
+import time
+import queue
+import threading
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+# Make `app.*` importable when run as `python backend/scripts/sweep.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.geo import (haversine, hex_tiles, split_tile, radius_for_density, circle_touches_bbox,
+                     circle_touches_polygon, point_in_polygon, polygon_bbox)
+from app.demand import record_spend
+from app.enrichment import get_vibe_from_ai, save_place, search_places_nearby
+
+load_dotenv()
+
+MAPS_KEY = os.getenv("GMAPS_KEY")
+AI_KEY = os.getenv("GEMINI_API_KEY")
+DATABASE_URL = os.getenv("DATABASE_URL")
+REGIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_regions.json")
+
+PLACES_MAX_RESULTS = 20      # searchNearby hard cap per call
+COVERED_THRESHOLD = 15       # Same bar as MIN_CACHED_RESULTS in app/main.py
+MIN_TILE_RADIUS_KM = 0.1
+MAX_SPLIT_DEPTH = 3          # 5km -> 625m; caps one saturated tile at 1 + 7 + 49 + 343 searches
+
+def estimate_density(cursor, south, west, north, east):
+    """Cafes per km² already known inside the bbox, or None if the sample is too small to trust."""
+    cursor.execute("""
+        SELECT COUNT(*), ST_Area(ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography) / 1e6
+        FROM places
+        WHERE location && ST_MakeEnvelope(%s, %s, %s, %s, 4326);
+    """, (west, south, east, north, west, south, east, north))
+    count, area_km2 = cursor.fetchone()
+    if count < 30 or not area_km2:
+        return None
+    return count / area_km2
+
+def tile_coverage(cursor, lat, lng, radius_km):
+    cursor.execute("""
+        SELECT COUNT(*) FROM places
+        WHERE ST_DWithin(location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s * 1000);
+    """, (lng, lat, radius_km))
+    return cursor.fetchone()[0]
+
+def known_place_ids(cursor, south, west, north, east, pad_deg=0.05):
+    cursor.execute("""
+        SELECT google_place_id FROM places
+        WHERE location && ST_MakeEnvelope(%s, %s, %s, %s, 4326);
+    """, (west - pad_deg, south - pad_deg, east + pad_deg, north + pad_deg))
+    return {row[0] for row in cursor.fetchall()}
+
+def load_polygons(path):
+    """Returns the outer rings of every Polygon/MultiPolygon in a GeoJSON file."""
+    with open(path) as f:
+        data = json.load(f)
+
+    geometries = []
+    if data.get('type') == 'FeatureCollection':
+        geometries = [feat['geometry'] for feat in data['features']]
+    elif data.get('type') == 'Feature':
+        geometries = [data['geometry']]
+    else:
+        geometries = [data]
+
+    rings = []
+    for geom in geometries:
+        if geom['type'] == 'Polygon':
+            rings.append(geom['coordinates'][0])
+        elif geom['type'] == 'MultiPolygon':
+            rings.extend(poly[0] for poly in geom['coordinates'])
+    return rings
+
+class Sweep:
+    def __init__(self, workers=4, covered_threshold=COVERED_THRESHOLD, max_depth=MAX_SPLIT_DEPTH, dry_run=False, max_calls=None):
+        self.workers = workers
+        self.max_calls = max_calls  # Places + AI calls allowed for this run (None = unlimited)
+        self.covered_threshold = covered_threshold
+        self.max_depth = max_depth  # None = keep splitting down to MIN_TILE_RADIUS_KM
+        self.dry_run = dry_run
+
+        self.tiles = queue.Queue()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.seen_ids = set()
+        self.stats = {
+            "tiles_total": 0, "tiles_done": 0, "tiles_covered": 0, "tiles_split": 0,
+            "places_calls": 0, "ai_calls": 0, "duplicates": 0, "saved": 0, "failed": 0,
+            "tiles_over_budget": 0, "tiles_failed": 0, "outside_area": 0,
+        }
+        self.started_at = time.time()
+
+    def _cursor(self):
+        # psycopg2 connections must not be shared across threads mid-transaction
+        if not hasattr(self.local, "conn"):
+            self.local.conn = psycopg2.connect(DATABASE_URL)
+        return self.local.conn, self.local.conn.cursor()
+
+    def _bump(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _spend(self, key):
+        """Reserves one upstream call against max_calls. Returns False once the budget is used up."""
+        with self.lock:
+            if self.max_calls is not None and self.stats["places_calls"] + self.stats["ai_calls"] >= self.max_calls:
+                return False
+            self.stats[key] += 1
+            return True
+
+    def _claim(self, pid):
+        """Returns True if this worker is the first to see pid in this run (or ever, via the DB preload)."""
+        with self.lock:
+            if pid in self.seen_ids:
+                self.stats["duplicates"] += 1
+                return False
+            self.seen_ids.add(pid)
+            return True
+
+    def add_tile(self, lat, lng, radius_km, depth, area):
+        self._bump("tiles_total")
+        self.tiles.put((lat, lng, radius_km, depth, area))
+
+    @staticmethod
+    def _tile_in_area(lat, lng, radius_km, area):
+        (south, west, north, east), polygons = area
+        if not circle_touches_bbox(lat, lng, radius_km, south, west, north, east):
+            return False
+        return not polygons or any(circle_touches_polygon(lat, lng, radius_km, ring) for ring in polygons)
+
+    @staticmethod
+    def _place_in_area(place, area):
+        (south, west, north, east), polygons = area
+        loc = place.get('location') or {}
+        lat, lng = loc.get('latitude'), loc.get('longitude')
+        if lat is None or lng is None or not (south <= lat <= north and west <= lng <= east):
+            return False
+        return not polygons or any(point_in_polygon(lat, lng, ring) for ring in polygons)
+
+    def plan_area(self, south, west, north, east, density=None, polygons=None):
+        conn, cursor = self._cursor()
+        if density is None:
+            # Unknown density starts at the coarsest tiles; saturated ones split where cafes actually are
+            density = estimate_density(cursor, south, west, north, east)
+
+        with self.lock:
+            self.seen_ids |= known_place_ids(cursor, south, west, north, east)
+        cursor.close()
+
+        # A small area gets one circle just big enough to cover it, not a 5km default
+        area_radius_km = max(MIN_TILE_RADIUS_KM, haversine(west, south, east, north) / 2)
+        radius_km = min(radius_for_density(density), area_radius_km)
+        area = ((south, west, north, east), polygons)
+        planned = 0
+        for lat, lng in hex_tiles(south, west, north, east, radius_km):
+            if not self._tile_in_area(lat, lng, radius_km, area):
+                continue
+            self.add_tile(lat, lng, radius_km, 0, area)
+            planned += 1
+        density_note = f"density≈{density:.0f}/km²" if density else "density unknown"
+        print(f"🗺️  Planned {planned} tiles (r={radius_km:.2f}km, {density_note})")
+        return planned
+
+    def _progress(self, msg):
+        with self.lock:
+            s = dict(self.stats)
+        elapsed = time.time() - self.started_at
+        print(f"[{s['tiles_done']}/{s['tiles_total']}] {msg} | places calls {s['places_calls']}, "
+              f"ai calls {s['ai_calls']}, saved {s['saved']}, dupes {s['duplicates']} ({elapsed:.0f}s)")
+
+    def _mine_tile(self, lat, lng, radius_km, depth, area):
+        conn, cursor = self._cursor()
+        try:
+            covered = tile_coverage(cursor, lat, lng, radius_km)
+            if covered >= self.covered_threshold:
+                self._bump("tiles_covered")
+                return f"({lat:.4f},{lng:.4f}) skipped, {covered} cached"
+
+            if self.dry_run:
+                return f"({lat:.4f},{lng:.4f}) r={radius_km:.2f}km would be searched"
+
+            if not self._spend("places_calls"):
+                self._bump("tiles_over_budget")
+                return f"({lat:.4f},{lng:.4f}) skipped, budget exhausted"
+            places = search_places_nearby(lat, lng, radius_km)
+            if places is None:
+                self._bump("tiles_failed")
+                return f"({lat:.4f},{lng:.4f}) search failed"
+
+            # A full page means the API truncated results: refine with smaller circles
+            deeper = self.max_depth is None or depth < self.max_depth
+            if len(places) >= PLACES_MAX_RESULTS and deeper and radius_km / 2 >= MIN_TILE_RADIUS_KM:
+                self._bump("tiles_split")
+                for c_lat, c_lng, c_r in split_tile(lat, lng, radius_km):
+                    # Children hanging off the edge of the area would mine someone else's area
+                    if self._tile_in_area(c_lat, c_lng, c_r, area):
+                        self.add_tile(c_lat, c_lng, c_r, depth + 1, area)
+
+            new_count = 0
+            for place in places:
+                pid = place.get('id')
+                if not self._place_in_area(place, area):
+                    self._bump("outside_area")
+                    continue
+                if not pid or not self._claim(pid):
+                    continue
+
+                if not self._spend("ai_calls"):
+                    break
+                vibe_data = get_vibe_from_ai(place.get('reviews', []))
+                if not vibe_data:
+                    self._bump("failed")
+                    continue
+
+                try:
+                    save_place(cursor, place, vibe_data)
+                    conn.commit()
+                    self._bump("saved")
+                    new_count += 1
+                except psycopg2.Error as e:
+                    # Another process may have inserted it since the preload
+                    conn.rollback()
+                    self._bump("failed")
+                    print(f"     ⚠️ Failed to save {pid}: {e}")
+
+            return f"({lat:.4f},{lng:.4f}) r={radius_km:.2f}km -> {len(places)} found, {new_count} new"
+        finally:
+            cursor.close()
+
+    def _worker(self):
+        while True:
+            tile = self.tiles.get()
+            if tile is None:
+                self.tiles.task_done()
+                return
+            try:
+                msg = self._mine_tile(*tile)
+            except Exception as e:
+                msg = f"❌ Tile {tile[:2]} crashed: {e}"
+            self._bump("tiles_done")
+            self._progress(msg)
+            self.tiles.task_done()
+
+    def run(self):
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        # Splits enqueue new tiles while running, so wait on the queue rather than a fixed list
+        self.tiles.join()
+        for _ in threads:
+            self.tiles.put(None)
+        for t in threads:
+            t.join()
+
+        s = self.stats
+        print(f"✅ Sweep complete: {s['tiles_done']} tiles ({s['tiles_covered']} already covered, {s['tiles_split']} split), "
+              f"{s['places_calls']} Places calls, {s['ai_calls']} AI calls, {s['saved']} saved, {s['duplicates']} duplicates avoided.")
+        return s
+
+    def record_spend(self, source):
+        """Adds this run's upstream calls to mining_spend so they show up on /mining/queue."""
+        conn, cursor = self._cursor()
+        try:
+            record_spend(cursor, source, places_calls=self.stats["places_calls"], ai_calls=self.stats["ai_calls"])
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"⚠️ Could not record spend: {e}")
+        finally:
+            cursor.close()
+
+def load_regions():
+    with open(REGIONS_FILE) as f:
+        return json.load(f)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tile an area and mine it with searchNearby.")
+    parser.add_argument("--region", action="append", default=[], help="Region key from seed_regions.json (repeatable)")
+    parser.add_argument("--all-regions", action="store_true", help="Sweep every region in seed_regions.json")
+    parser.add_argument("--bbox", help="south,west,north,east")
+    parser.add_argument("--polygon", help="GeoJSON file with a Polygon/MultiPolygon city boundary")
+    parser.add_argument("--density", type=float, help="Expected cafes per km² (default: estimated from DB)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--covered", type=int, default=COVERED_THRESHOLD, help="Skip tiles with at least this many cached places")
+    parser.add_argument("--max-depth", type=int, default=MAX_SPLIT_DEPTH, help="How many times a saturated tile may be split")
+    parser.add_argument("--max-calls", type=int, help="Stop mining after this many Places + AI calls")
+    parser.add_argument("--dry-run", action="store_true", help="Plan and check coverage without calling Google/Gemini")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if not args.dry_run and (not MAPS_KEY or not AI_KEY):
+        print("❌ ERROR: Missing Keys in .env")
+        exit(1)
+
+    sweep = Sweep(workers=args.workers, covered_threshold=args.covered, max_depth=args.max_depth,
+                  dry_run=args.dry_run, max_calls=args.max_calls)
+
+    areas = []
+    if args.bbox:
+        areas.append(("bbox", [float(x) for x in args.bbox.split(",")], None))
+    if args.polygon:
+        rings = load_polygons(args.polygon)
+        if not rings:
+            print(f"❌ No polygons found in {args.polygon}")
+            exit(1)
+        all_points = [p for ring in rings for p in ring]
+        areas.append((os.path.basename(args.polygon), polygon_bbox(all_points), rings))
+    if args.region or args.all_regions:
+        regions = load_regions()
+        keys = list(regions) if args.all_regions else args.region
+        for key in keys:
+            if key not in regions:
+                print(f"❌ Unknown region '{key}'. Options: {', '.join(regions)}")
+                exit(1)
+            areas.append((regions[key]['label'], regions[key]['bbox'], None))
+
+    if not areas:
+        print("❌ Nothing to sweep. Pass --region, --all-regions, --bbox or --polygon.")
+        exit(1)
+
+    for label, (south, west, north, east), polygons in areas:
+        print(f"📍 Planning {label}...")
+        sweep.plan_area(south, west, north, east, density=args.density, polygons=polygons)
+
+    sweep.run()
+    if not args.dry_run:
+        sweep.record_spend("sweep")
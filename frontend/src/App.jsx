@@ -99,6 +99,16 @@ function App() {
   const searchInputRef = useRef(null);
   const mapRef = useRef(null);
 
+  // Warm the server caches for the cells around the current view (fire-and-forget)
+  const prefetchNeighbours = (lat, lng, radius_km) => {
+    const BE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+    fetch(`${BE_URL}/cafes/prefetch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ lat, lng, radius_km }),
+    }).catch(() => {});
+  };
+
   // Progressive Live Loading (Server-Sent Events)
   const loadCafes = async (lat, lng) => {
     setCafes([]); // Clear current map
@@ -150,6 +160,7 @@ function App() {
       console.error("Stream Fetch Error:", err);
     } finally {
       setIsRadarScanning(false);
+      prefetchNeighbours(lat, lng, maxDistance);
     }
   };
 
@@ -653,12 +664,13 @@ const MiniTag = ({ config, label }) => (
 );
 
 const Badge = ({ config, val, fallback }) => {
-  // Price Fallback Logic: If val is missing/Unknown, use Google's price_level (1-3)
+  // Price Fallback Logic: If val is missing/Unknown, use Google's price_level (0-4, null when unknown)
   let displayVal = val;
-  if ((!val || val === 'Unknown') && config.label === 'Price' && fallback) {
+  if ((!val || val === 'Unknown') && config.label === 'Price' && fallback != null) {
+    if (fallback === 0) displayVal = 'Free';
     if (fallback === 1) displayVal = 'Cheap';
     if (fallback === 2) displayVal = 'Fair';
-    if (fallback === 3) displayVal = 'Pricey';
+    if (fallback >= 3) displayVal = 'Pricey';
   }
 
   return (